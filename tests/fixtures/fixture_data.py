@@ -12,6 +12,11 @@ def mock_media(settings):
         yield temp_directory
 
 
+@pytest.fixture(autouse=True)
+def no_thumbnail_workers(settings):
+    settings.THUMBNAIL_WORKERS = 0
+
+
 @pytest.fixture
 def mixer():
     return _mixer
@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .checks import refuse_debug_tools
+        from .db import apply_sqlite_pragmas
+
+        refuse_debug_tools()
+        connection_created.connect(apply_sqlite_pragmas)
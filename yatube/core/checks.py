@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+from django.core.exceptions import ImproperlyConfigured
+
+DEBUG_APPS = ('debug_toolbar',)
+# Кеши, которые видит только один процесс сервера
+PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.security, deploy=True)
+def debug_tools_check(app_configs, **kwargs):
+    """Без DEBUG отладочные приложения и middleware не запускаются:
+    они замедляют каждый запрос и раскрывают внутренности сайта.
+
+    Проверка выполняется в manage.py check --deploy перед выкладкой,
+    а при запуске процесса ее повторяет refuse_debug_tools.
+    """
+    if settings.DEBUG:
+        return []
+    errors = []
+    for app in DEBUG_APPS:
+        found = [
+            name for name in (*settings.INSTALLED_APPS, *settings.MIDDLEWARE)
+            if name == app or name.startswith(f'{app}.')
+        ]
+        if found:
+            errors.append(Error(
+                f'{app} включен при DEBUG = False: ' + ', '.join(found),
+                hint='Используйте yatube.settings_production.',
+                id='core.E001',
+            ))
+    return errors
+
+
+@register(Tags.caches, deploy=True)
+def shared_cache_check(app_configs, **kwargs):
+    """Поколения лент, кеш страниц и блокировки posts/cache.py
+    работают, только если кеш общий для всех процессов сервера.
+    """
+    if settings.DEBUG:
+        return []
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in PROCESS_CACHES:
+        return []
+    return [Warning(
+        f'Кеш {backend} не общий для процессов сервера',
+        hint='Задайте DJANGO_CACHE_BACKEND в yatube.settings_production.',
+        id='core.W002',
+    )]
+
+
+def refuse_debug_tools():
+    """Не дает запустить сайт без DEBUG с отладочными инструментами.
+
+    Вызывается из CoreConfig.ready(), то есть при запуске любого
+    процесса: runserver, WSGI-сервера, команд. Обычной проверкой
+    она быть не может: тестовый раннер выключает DEBUG перед
+    проверками, не убирая панель отладки.
+    """
+    errors = debug_tools_check(None)
+    if errors:
+        raise ImproperlyConfigured(
+            '; '.join(f'{error.msg}. {error.hint}' for error in errors)
+        )
@@ -0,0 +1,23 @@
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+PRAGMA = re.compile(r'^\w+$')
+PRAGMA_VALUE = re.compile(r'^-?\w+$')
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Выполняет PRAGMA из settings.SQLITE_PRAGMAS на новом соединении.
+
+    Запросы идут мимо курсора Django, чтобы не попадать в журнал
+    запросов и в assertNumQueries.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        if not PRAGMA.match(name) or not PRAGMA_VALUE.match(str(value)):
+            raise ImproperlyConfigured(
+                f'SQLITE_PRAGMAS: недопустимая настройка {name}={value}'
+            )
+        connection.connection.execute(f'PRAGMA {name} = {value}')
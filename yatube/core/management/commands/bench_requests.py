@@ -0,0 +1,69 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+
+def default_urls():
+    """Главная, первая группа, профиль и страница последнего поста."""
+    urls = [reverse('posts:index')]
+    group = Group.objects.first()
+    if group is not None:
+        urls.append(reverse('posts:group_list', args=(group.slug,)))
+    post = Post.objects.select_related('author').first()
+    if post is not None:
+        urls.append(reverse('posts:profile', args=(post.author.username,)))
+        urls.append(reverse('posts:post_detail', args=(post.pk,)))
+    return urls
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа страниц в текущих настройках. Для '
+        'сравнения профилей запустите с --settings=yatube.settings и '
+        '--settings=yatube.settings_production.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='*', help='Адреса страниц.')
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument(
+            '--host',
+            default='localhost',
+            help='Заголовок Host; должен входить в ALLOWED_HOSTS.',
+        )
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Очищать кеш перед каждым запросом.',
+        )
+
+    def handle(self, *args, **options):
+        client = Client(HTTP_HOST=options['host'])
+        self.stdout.write(
+            f'{settings.SETTINGS_MODULE}: DEBUG={settings.DEBUG}, '
+            f'CONN_MAX_AGE={settings.DATABASES["default"]["CONN_MAX_AGE"]}'
+        )
+        for url in options['urls'] or default_urls():
+            status = client.get(url).status_code
+            if status != 200:
+                raise CommandError(f'{url}: ответ {status}')
+            timings = []
+            for _ in range(options['requests']):
+                if options['cold']:
+                    cache.clear()
+                started = time.perf_counter()
+                client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            self.stdout.write(
+                f'{url}: медиана {statistics.median(timings):.1f} мс, '
+                f'p95 {p95:.1f} мс'
+            )
@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.test import override_settings
+
+from posts.models import Comment, Post
+
+READS_PER_WRITE = 4
+
+
+class Command(BaseCommand):
+    help = (
+        'Смешанная нагрузка на SQLite из нескольких потоков: чтение ленты '
+        'и запись комментариев (записи откатываются). Печатает число '
+        'операций и ошибок "database is locked"; --no-pragmas сравнивает '
+        'с режимом без SQLITE_PRAGMAS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=int, default=5)
+        parser.add_argument(
+            '--no-pragmas',
+            action='store_true',
+            help='Обычный журнал отката без WAL и ожидания блокировки.',
+        )
+
+    def handle(self, *args, **options):
+        post = Post.objects.select_related('author').first()
+        if post is None:
+            raise CommandError('Для замера нужен хотя бы один пост.')
+        overrides = {}
+        if options['no_pragmas']:
+            overrides['SQLITE_PRAGMAS'] = {
+                'journal_mode': 'delete', 'busy_timeout': 0
+            }
+        with override_settings(**overrides):
+            stats = self.run(post, options)
+        elapsed = options['seconds']
+        for name in ('reads', 'writes', 'locked'):
+            self.stdout.write(
+                f'{name}: {stats[name]} ({stats[name] / elapsed:.0f}/с)'
+            )
+
+    def run(self, post, options):
+        stats = Counter()
+        lock = threading.Lock()
+        stop = time.time() + options['seconds']
+
+        def worker():
+            done = 0
+            try:
+                while time.time() < stop:
+                    try:
+                        if done % (READS_PER_WRITE + 1):
+                            list(Post.objects.with_related()[:10])
+                            result = 'reads'
+                        else:
+                            with transaction.atomic():
+                                Comment.objects.create(
+                                    post=post, author=post.author, text='-'
+                                )
+                                transaction.set_rollback(True)
+                            result = 'writes'
+                    except OperationalError:
+                        result = 'locked'
+                    done += 1
+                    with lock:
+                        stats[result] += 1
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker)
+            for _ in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return stats
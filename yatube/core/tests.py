@@ -0,0 +1,72 @@
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .checks import (
+    debug_tools_check, refuse_debug_tools, shared_cache_check
+)
+from .db import apply_sqlite_pragmas
+
+
+class DebugToolsCheckTest(SimpleTestCase):
+    @override_settings(DEBUG=False)
+    def test_debug_toolbar_refused_without_debug(self):
+        """Без DEBUG панель отладки не проходит проверку."""
+        errors = debug_tools_check(None)
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+
+    @override_settings(
+        DEBUG=False,
+        INSTALLED_APPS=['django.contrib.auth'],
+        MIDDLEWARE=[],
+    )
+    def test_production_settings_pass(self):
+        """Без панели отладки проверка проходит."""
+        self.assertEqual(debug_tools_check(None), [])
+
+    @override_settings(DEBUG=True)
+    def test_debug_toolbar_allowed_in_debug(self):
+        self.assertEqual(debug_tools_check(None), [])
+        refuse_debug_tools()
+
+    @override_settings(DEBUG=False)
+    def test_startup_refused_without_debug(self):
+        """Процесс без DEBUG с панелью отладки не запускается."""
+        with self.assertRaisesMessage(ImproperlyConfigured, 'debug_toolbar'):
+            apps.get_app_config('core').ready()
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+    @override_settings(DEBUG=False)
+    def test_process_cache_warned_without_debug(self):
+        """Без DEBUG кеш в памяти процесса не проходит проверку."""
+        self.assertEqual(
+            [warning.id for warning in shared_cache_check(None)],
+            ['core.W002'],
+        )
+
+    @override_settings(DEBUG=False, CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'yatube_cache',
+    }})
+    def test_shared_cache_passes(self):
+        self.assertEqual(shared_cache_check(None), [])
+
+
+class SqlitePragmasTest(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_on_connect(self):
+        """Новое соединение получает PRAGMA из настроек."""
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('cache_size'), -20000)
+        self.assertEqual(self.pragma('temp_store'), 2)
+
+    @override_settings(SQLITE_PRAGMAS={'busy_timeout': '1; DROP TABLE x'})
+    def test_bad_pragma_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            apply_sqlite_pragmas(None, connection)
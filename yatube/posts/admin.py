@@ -1,35 +1,196 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin import helpers
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.db.models import Max, Min
+from django.template.response import TemplateResponse
 
+from . import bulk, search
 from .models import Group, Post, Comment, Follow
+from .utils import EstimatedCountPaginator
 
 
-class PostAdmin(admin.ModelAdmin):
+class ScalableAdmin(admin.ModelAdmin):
+    """Список не считает строки всей таблицы: ни для паджинатора,
+    ни для надписи «из N».
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def confirm_action(self, request, title, message, form=None):
+        """Страница подтверждения массового действия. Действие
+        выполняется, когда она отправлена обратно с полем apply.
+        """
+        return TemplateResponse(request, 'admin/posts/bulk_action.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': title,
+            'message': message,
+            'form': form,
+            'action': request.POST['action'],
+            'select_across': request.POST.get('select_across', 0),
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+        })
+
+
+class MoveToGroupForm(forms.Form):
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        required=False,
+        label='Группа',
+        help_text='Пустое значение убирает посты из групп',
+    )
+
+
+class RowAutocompleteSelect(AutocompleteSelect):
+    """Автокомплит, которому выбранный объект передан заранее, —
+    без отдельного запроса на каждую строку списка.
+    """
+    selected = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = self.selected
+        if selected is None or [str(selected.pk)] != list(value):
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        options.append(self.create_option(
+            name,
+            selected.pk,
+            self.choices.field.label_from_instance(selected),
+            True,
+            len(options),
+        ))
+        return [(None, options, 0)]
+
+
+class PostRowForm(forms.ModelForm):
+    """Строка списка постов: группа уже загружена вместе с постом."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        widget = self.fields['group'].widget
+        # Виджет обернут в RelatedFieldWidgetWrapper
+        getattr(widget, 'widget', widget).selected = self.instance.group
+
+
+class PostAdmin(ScalableAdmin):
     # Перечисляем поля, которые должны отображаться в админке
     list_display = ('pk', 'text', 'pub_date', 'author', 'group',)
     # Добавляем возможность изменять поле group в любом посте из списка постов
     list_editable = ('group',)
+    # Автор и группа выбираются поиском, а не из <select> со всеми
+    # пользователями и группами в каждой строке
+    autocomplete_fields = ('author', 'group')
+    list_select_related = ('author', 'group')
     # Добавляем интерфейс для поиска по тексту постов
     search_fields = ('text',)
     # Добавляем возможность фильтрации по дате
     list_filter = ('pub_date',)
+    # Навигация по датам идет по индексу posts_post_feed_idx
+    date_hierarchy = 'pub_date'
     empty_value_display = '-пусто-'
+    actions = ('move_to_group', 'delete_by_author')
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск идет по индексу FTS5, а не LIKE '%...%' по всем текстам
+        if not search_term:
+            return queryset, False
+        return search.filter_posts(queryset, search_term), False
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'group':
+            kwargs['widget'] = RowAutocompleteSelect(
+                db_field.remote_field,
+                self.admin_site,
+                using=kwargs.get('using'),
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        return super().get_changelist_form(request, form=PostRowForm, **kwargs)
+
+    def move_to_group(self, request, queryset):
+        form = MoveToGroupForm(
+            request.POST if 'apply' in request.POST else None
+        )
+        if form.is_valid():
+            moved = bulk.move_posts(queryset, form.cleaned_data['group'])
+            self.message_user(request, f'Перенесено постов: {moved}')
+            return None
+        return self.confirm_action(
+            request,
+            'Перенести посты в группу',
+            f'Выбрано постов: {queryset.count()}',
+            form,
+        )
+    move_to_group.short_description = 'Перенести в группу'
 
+    def delete_by_author(self, request, queryset):
+        # Авторы запоминаются заранее: выбранные посты удаляются
+        # первыми же пачками
+        posts = Post.objects.filter(author__in=set(
+            queryset.values_list('author_id', flat=True).distinct()
+        ))
+        if 'apply' in request.POST:
+            deleted = bulk.delete_posts(posts)
+            self.message_user(request, f'Удалено постов: {deleted}')
+            return None
+        return self.confirm_action(
+            request,
+            'Удалить все посты авторов',
+            f'Будут удалены все посты авторов выбранных постов '
+            f'с комментариями: {posts.count()}',
+        )
+    delete_by_author.short_description = 'Удалить все посты их авторов'
 
-class CommentAdmin(admin.ModelAdmin):
+
+class CommentAdmin(ScalableAdmin):
     list_display = ('text', 'author', 'post', 'created',)
-    list_filter = ('post', 'created',)
+    list_filter = ('created',)
+    raw_id_fields = ('post',)
+    autocomplete_fields = ('author',)
+    list_select_related = ('author', 'post')
     search_fields = ('text', )
+    date_hierarchy = 'created'
+    actions = ('purge',)
+
+    def purge(self, request, queryset):
+        # Диапазон дат задается фильтрами списка и «выбрать все»
+        if 'apply' in request.POST:
+            deleted = bulk.delete_comments(queryset)
+            self.message_user(request, f'Удалено комментариев: {deleted}')
+            return None
+        dates = queryset.aggregate(first=Min('created'), last=Max('created'))
+        return self.confirm_action(
+            request,
+            'Удалить комментарии',
+            f'Комментариев: {queryset.count()}, '
+            f'с {dates["first"]:%d.%m.%Y %H:%M} '
+            f'по {dates["last"]:%d.%m.%Y %H:%M}',
+        )
+    purge.short_description = 'Удалить выбранные комментарии без загрузки'
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(ScalableAdmin):
     list_display = ('user', 'author', )
-    list_filter = ('author', )
-    search_fields = ('author', )
+    autocomplete_fields = ('user', 'author')
+    list_select_related = ('user', 'author')
+    # Точное совпадение имени ищется по уникальному индексу
+    search_fields = ('=user__username', '=author__username')
+
+
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('title', 'slug',)
+    # Нужен для выбора группы поиском в PostAdmin
+    search_fields = ('title', 'slug',)
+    prepopulated_fields = {'slug': ('title',)}
 
 
 # При регистрации модели Post источником конфигурации для неё назначаем
 # класс PostAdmin
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
+admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
@@ -0,0 +1,118 @@
+"""Массовые изменения постов и комментариев для админки.
+
+Строки меняются пачками по BATCH_SIZE: один UPDATE или DELETE на
+пачку в своей транзакции, без загрузки объектов и без сигналов
+каждой строки. Поэтому счетчики, поисковый индекс, ссылки на картинки
+и поколения кеша поправляются здесь — один раз на пачку и только
+там, где изменение видно.
+"""
+from collections import Counter
+
+from django.db import transaction
+
+from . import cache, counters, search, storage, timeline
+from .models import Comment, Mention, Post, PostTag, TimelineEntry
+
+BATCH_SIZE = 500
+
+
+def _batches(queryset):
+    """id строк queryset пачками по возрастанию; уже измененные
+    или удаленные строки следующую пачку не сдвигают.
+    """
+    ids = queryset.order_by('pk').values_list('pk', flat=True)
+    batch = list(ids[:BATCH_SIZE])
+    while batch:
+        yield batch
+        batch = list(ids.filter(pk__gt=batch[-1])[:BATCH_SIZE])
+
+
+def _feed_namespaces(rows):
+    """Ленты, в которых видны посты [(id, slug группы, имя автора)]."""
+    namespaces = {cache.INDEX}
+    for post_id, slug, username in rows:
+        namespaces.add(cache.post_namespace(post_id))
+        namespaces.add(cache.profile_namespace(username))
+        if slug:
+            namespaces.add(cache.group_namespace(slug))
+    return namespaces
+
+
+def _rows(batch):
+    return list(Post.objects.filter(pk__in=batch).values_list(
+        'pk', 'group__slug', 'author__username'
+    ))
+
+
+def move_posts(queryset, group):
+    """Переносит посты в группу group (None — убрать из группы)
+    и возвращает число перенесенных постов.
+
+    Счетчики и индекс от группы не зависят; сбрасывается кеш главной,
+    страниц постов, профилей, обеих групп и лент подписчиков авторов —
+    в карточке поста есть ссылка на группу.
+    """
+    moved = 0
+    namespaces = set()
+    if group is not None:
+        namespaces.add(cache.group_namespace(group.slug))
+    for batch in _batches(queryset):
+        with transaction.atomic():
+            posts = Post.objects.filter(pk__in=batch)
+            namespaces |= _feed_namespaces(_rows(batch))
+            timeline.touch_followers(
+                set(posts.values_list('author_id', flat=True))
+            )
+            moved += posts.update(group=group)
+    cache.bump(*namespaces)
+    return moved
+
+
+def delete_posts(queryset):
+    """Удаляет посты с их комментариями, записями лент подписок,
+    тегами и упоминаниями и возвращает число удаленных постов.
+    """
+    deleted = 0
+    namespaces = set()
+    for batch in _batches(queryset):
+        with transaction.atomic():
+            rows = _rows(batch)
+            namespaces |= _feed_namespaces(rows)
+            posts = Post.objects.filter(pk__in=batch)
+            author_ids = set(posts.values_list('author_id', flat=True))
+            images = Counter(posts.exclude(
+                image=''
+            ).values_list('image', flat=True))
+            for model in (TimelineEntry, PostTag, Mention):
+                model.objects.filter(post_id__in=batch).delete()
+            # У постов и комментариев есть обработчики post_delete,
+            # поэтому обычный delete() загрузил бы каждую строку
+            comments = Comment.objects.filter(post_id__in=batch)
+            comments._raw_delete(comments.db)
+            deleted += posts._raw_delete(posts.db)
+            search.remove(*batch)
+            for name, count in images.items():
+                storage.release(name, count)
+            counters.rebuild_users(author_ids)
+            timeline.touch_followers(author_ids)
+    cache.bump(*namespaces)
+    return deleted
+
+
+def delete_comments(queryset):
+    """Удаляет комментарии и возвращает их число.
+
+    Комментарии видны только на страницах постов, поэтому, кроме
+    счетчиков постов, сбрасывается только их кеш.
+    """
+    deleted = 0
+    post_ids = set()
+    for batch in _batches(queryset):
+        with transaction.atomic():
+            comments = Comment.objects.filter(pk__in=batch)
+            touched = set(comments.values_list('post_id', flat=True))
+            deleted += comments._raw_delete(comments.db)
+            counters.rebuild_posts(touched)
+            post_ids |= touched
+    cache.bump(*map(cache.post_namespace, post_ids))
+    return deleted
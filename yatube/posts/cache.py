@@ -0,0 +1,245 @@
+"""Кеш лент с поколениями.
+
+Ключ страницы ленты включает номер поколения ее пространства имен
+(главная, группа, профиль, подписки, пост). Запись меняет поколение,
+и все старые страницы этого пространства перестают читаться сразу,
+без перебора и удаления ключей.
+
+Значения пересчитывает один процесс (single-flight), а незадолго до
+истечения срока пересчет начинается с вероятностью, растущей к концу
+срока (XFetch), поэтому истечение горячего ключа не вызывает лавину
+одинаковых запросов к базе.
+"""
+import hashlib
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.paginator import Page, Paginator
+
+from .utils import CursorPaginator
+
+INDEX = 'index'
+PAGE_HITS = 'page_cache:hits'
+PAGE_MISSES = 'page_cache:misses'
+# Сколько секунд держится блокировка пересчета и сколько его ждут
+# процессы, которым нечего отдать
+LOCK_TIMEOUT = 10
+LOCK_POLL = 0.05
+# Чем больше, тем раньше начинается досрочный пересчет
+XFETCH_BETA = 1.0
+# Имя фрагмента карточки поста в includes/post.html
+POST_CARD = 'post_card'
+
+
+def group_namespace(slug):
+    return f'group:{slug}'
+
+
+def profile_namespace(username):
+    return f'profile:{username}'
+
+
+def follow_namespace(user_id):
+    return f'follow:{user_id}'
+
+
+def post_namespace(post_id):
+    return f'post:{post_id}'
+
+
+def _generation_key(namespace):
+    return f'generation:{namespace}'
+
+
+def generations(*namespaces):
+    """Текущие поколения пространств имен.
+
+    Пропавшее из кеша поколение заводится заново от текущего времени
+    в миллисекундах, поэтому оно не совпадет ни с одним из прежних.
+    """
+    keys = [_generation_key(namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            initial = int(time.time() * 1000)
+            cache.add(key, initial, None)
+            found[key] = cache.get(key, initial)
+    return [found[key] for key in keys]
+
+
+def bump(*namespaces):
+    """Сдвигает поколения: закешированные страницы устаревают."""
+    for namespace in set(namespaces):
+        key = _generation_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, int(time.time() * 1000), None)
+
+
+def _expired(expiry, delta, beta=XFETCH_BETA):
+    """Пора ли пересчитывать значение, которое строилось delta секунд.
+
+    XFetch: -log(random()) обычно мал, но иногда велик, поэтому
+    кто-то один начинает пересчет незадолго до срока, и тем вероятнее,
+    чем дороже пересчет и ближе срок.
+    """
+    return time.time() - delta * beta * math.log(1 - random.random()) >= expiry
+
+
+def get_or_build(key, build, timeout, cacheable=None):
+    """Значение из кеша или результат build() для всех процессов разом.
+
+    Возвращает пару (значение, построено ли оно в этом вызове).
+    Значение хранится дольше своего срока на LOCK_TIMEOUT: пока один
+    процесс пересчитывает устаревшее значение, остальные отдают
+    прежнее. Если значения нет совсем, они ждут пересчета, но не
+    дольше LOCK_TIMEOUT.
+    """
+    lock_key = f'lock:{key}'
+    deadline = time.time() + LOCK_TIMEOUT
+    while True:
+        entry = cache.get(key)
+        if entry is not None:
+            value, delta, expiry = entry
+            if not _expired(expiry, delta):
+                return value, False
+        if cache.add(lock_key, 1, LOCK_TIMEOUT):
+            break
+        if entry is not None:
+            return value, False
+        if time.time() >= deadline:
+            # Пересчет завис или упал: строим сами, не дожидаясь
+            break
+        time.sleep(LOCK_POLL)
+    try:
+        started = time.time()
+        value = build()
+        delta = time.time() - started
+        if cacheable is None or cacheable(value):
+            cache.set(
+                key,
+                (value, delta, time.time() + timeout),
+                timeout + LOCK_TIMEOUT,
+            )
+    finally:
+        cache.delete(lock_key)
+    return value, True
+
+
+def _feed_key(namespace, request, version):
+    generation, = generations(namespace)
+    query = '&'.join(
+        f'{param}={request.GET.get(param, "")}'
+        for param in ('page', 'cursor')
+    )
+    digest = hashlib.md5(query.encode()).hexdigest()
+    return f'feed:{namespace}:{generation}:{version}:{digest}'
+
+
+def _pack(page):
+    """Страница без запроса паджинатора: его QuerySet не кешируется."""
+    paginator = page.paginator
+    state = {
+        'object_list': list(page.object_list),
+        'number': page.number,
+        'per_page': paginator.per_page,
+        'is_cursor': getattr(paginator, 'is_cursor', False),
+    }
+    if state['is_cursor']:
+        state.update(
+            keys=paginator.keys,
+            next_cursor=paginator.next_cursor,
+            previous_cursor=paginator.previous_cursor,
+            num_pages=paginator.num_pages,
+        )
+    else:
+        state['count'] = paginator.count
+    return state
+
+
+def _unpack(state):
+    if state['is_cursor']:
+        paginator = CursorPaginator([], state['per_page'], state['keys'])
+        paginator.next_cursor = state['next_cursor']
+        paginator.previous_cursor = state['previous_cursor']
+        paginator._num_pages = state['num_pages']
+    else:
+        paginator = Paginator([], state['per_page'])
+        paginator.count = state['count']
+    return Page(state['object_list'], state['number'], paginator)
+
+
+def feed_page(request, namespace, build, version=0):
+    """Контекст страницы ленты из кеша.
+
+    build() строит контекст с page_obj, если страницы нет в кеше
+    или ее поколение устарело. version — дополнительная версия ленты
+    из базы (UserStats.feed_version у ленты подписок).
+    """
+    context = {}
+
+    def pack():
+        context.update(build())
+        return _pack(context['page_obj'])
+
+    state, built = get_or_build(
+        _feed_key(namespace, request, version),
+        pack,
+        settings.FEED_CACHE_TIMEOUT,
+    )
+    if built:
+        return context
+    return {'page_obj': _unpack(state)}
+
+
+def forget_card(version):
+    """Удаляет закешированную карточку поста прежней версии.
+
+    Новая версия и так читается по другому ключу, а удаление
+    освобождает память сразу, не дожидаясь истечения срока.
+    """
+    cache.delete(make_template_fragment_key(POST_CARD, [version]))
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def page_response(key, build, cacheable):
+    """Готовый ответ страницы для гостя.
+
+    key уже включает поколения всех пространств страницы, поэтому
+    запись поста, комментария или подписки сама выводит ответ из
+    обращения. cacheable(response) решает, можно ли отдать ответ
+    другим гостям.
+    """
+    if not settings.PAGE_CACHE_TIMEOUT:
+        return build()
+    response, built = get_or_build(
+        f'page:{key}', build, settings.PAGE_CACHE_TIMEOUT, cacheable
+    )
+    if built:
+        _count(PAGE_MISSES)
+        response['X-Page-Cache'] = 'MISS'
+    else:
+        _count(PAGE_HITS)
+        response['X-Page-Cache'] = 'HIT'
+    return response
+
+
+def page_stats():
+    """Попадания и промахи кеша страниц с последнего сброса."""
+    found = cache.get_many([PAGE_HITS, PAGE_MISSES])
+    return found.get(PAGE_HITS, 0), found.get(PAGE_MISSES, 0)
+
+
+def reset_page_stats():
+    cache.delete_many([PAGE_HITS, PAGE_MISSES])
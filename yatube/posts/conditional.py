@@ -0,0 +1,110 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, quote_etag
+)
+
+from . import cache, counters
+from .models import Post
+
+
+def _etag(request, *namespaces, version=0):
+    """ETag из поколений кеша, пользователя и адреса страницы.
+
+    Поколения сдвигаются при каждой записи, поэтому совпавший ETag
+    означает, что страница не менялась, и отдается 304 без запросов
+    к базе и рендеринга шаблона. Страница пользователя несет
+    csrf-токен его формы, а вход меняет токен, поэтому после нового
+    входа прежняя копия не подходит.
+    """
+    parts = [str(generation) for generation in cache.generations(
+        *namespaces
+    )]
+    parts.append(str(version))
+    parts.append(str(request.user.pk or 0))
+    if request.user.is_authenticated:
+        parts.append(request.META.get('CSRF_COOKIE', ''))
+    parts.append(request.get_full_path())
+    return hashlib.md5(':'.join(parts).encode()).hexdigest()
+
+
+def index_etag(request):
+    return _etag(request, cache.INDEX)
+
+
+def group_etag(request, slug):
+    return _etag(request, cache.group_namespace(slug))
+
+
+def profile_etag(request, username):
+    # Подписка и отписка тоже сдвигают поколение профиля
+    return _etag(request, cache.profile_namespace(username))
+
+
+def post_etag(request, post_id):
+    username = Post.objects.filter(pk=post_id).values_list(
+        'author__username', flat=True
+    ).first()
+    if username is None:
+        return None
+    return _etag(
+        request,
+        cache.post_namespace(post_id),
+        cache.profile_namespace(username),
+    )
+
+
+def follow_etag(request):
+    return _etag(
+        request,
+        cache.follow_namespace(request.user.pk),
+        version=counters.user_stats(request.user).feed_version,
+    )
+
+
+def _cacheable(request, response):
+    # Страница с csrf-токеном или cookie принадлежит одному гостю
+    return (
+        response.status_code == 200
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_USED')
+    )
+
+
+def conditional_view(etag_func):
+    """Отвечает 304 Not Modified, если ETag клиента совпал,
+    а гостям отдает готовую страницу из кеша.
+
+    Ответ можно хранить в браузере и на обратном прокси, но перед
+    выдачей его нужно перепроверять (no-cache); ответы пользователям
+    с сессией остаются private.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            etag = None
+            if request.method in ('GET', 'HEAD'):
+                etag = etag_func(request, *args, **kwargs)
+            if etag is None:
+                response = view(request, *args, **kwargs)
+            else:
+                etag = quote_etag(etag)
+                response = get_conditional_response(request, etag=etag)
+            if response is None and request.user.is_authenticated:
+                response = view(request, *args, **kwargs)
+            elif response is None:
+                response = cache.page_response(
+                    etag,
+                    lambda: view(request, *args, **kwargs),
+                    lambda response: _cacheable(request, response),
+                )
+            if etag is not None and response.status_code == 200:
+                response['ETag'] = etag
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,97 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, User, UserStats
+
+BATCH_SIZE = 500
+
+
+def _change(queryset, **deltas):
+    return queryset.update(**{
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    })
+
+
+def change_user(user_id, **deltas):
+    """Сдвигает счетчики пользователя, если у него есть строка.
+
+    Строку здесь не создаем: при удалении пользователя CASCADE
+    удаляет ее раньше его постов и подписок, и новая строка
+    сослалась бы на удаляемого пользователя. Недостающую строку
+    пересчитает с нуля user_stats при чтении.
+    """
+    _change(UserStats.objects.filter(user_id=user_id), **deltas)
+
+
+def user_stats(user):
+    """Счетчики пользователя. У пользователя, загруженного loaddata
+    или bulk_create, строки нет — она создается и пересчитывается.
+    """
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        rebuild_users([user.pk])
+        user.stats = UserStats.objects.get(user_id=user.pk)
+        return user.stats
+
+
+def change_comments(post_id, delta):
+    """Сдвигает счетчик комментариев поста."""
+    _change(Post.objects.filter(pk=post_id), comments_count=delta)
+
+
+def _count(model, field, outer='user_id'):
+    """Подзапрос с числом строк model, где field равен outer."""
+    rows = (
+        model.objects
+        .filter(**{field: OuterRef(outer)})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(rows), 0)
+
+
+def _batches(model, ids=None):
+    """Отдает id пачками: заданные списком или все id модели
+    по возрастанию, без загрузки всей таблицы в память.
+    """
+    if ids is not None:
+        ids = list(ids)
+        for start in range(0, len(ids), BATCH_SIZE):
+            yield ids[start:start + BATCH_SIZE]
+        return
+    last = 0
+    while True:
+        batch = list(
+            model.objects.filter(pk__gt=last).order_by('pk')
+            .values_list('pk', flat=True)[:BATCH_SIZE]
+        )
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+
+
+def rebuild_users(user_ids=None):
+    """Пересчитывает счетчики пользователей пачками по BATCH_SIZE."""
+    for batch in _batches(User, user_ids):
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=user_id) for user_id in batch],
+            ignore_conflicts=True,
+        )
+        UserStats.objects.filter(user_id__in=batch).update(
+            posts_count=_count(Post, 'author_id'),
+            followers_count=_count(Follow, 'author_id'),
+            following_count=_count(Follow, 'user_id'),
+        )
+
+
+def rebuild_posts(post_ids=None):
+    """Пересчитывает счетчики комментариев постов пачками."""
+    for batch in _batches(Post, post_ids):
+        Post.objects.filter(pk__in=batch).update(
+            comments_count=_count(Comment, 'post_id', outer='pk')
+        )
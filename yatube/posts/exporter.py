@@ -0,0 +1,156 @@
+"""Выгрузка постов, комментариев и подписок в JSONL или CSV.
+
+Строки читаются пачками по CHUNK_SIZE по ключу (дата, id): каждая
+пачка — отдельный короткий запрос от последней строки предыдущей,
+поэтому память не растет с размером таблицы, а запрос глубоко
+в выгрузке стоит столько же, сколько первый. Поля записей те же,
+что читает importer, так что выгрузку можно загрузить обратно.
+"""
+import csv
+import json
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .importer import COMMENTS, CSV, FOLLOWS, JSONL, POSTS
+from .models import Comment, Follow, Post
+
+CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    JSONL: 'application/x-ndjson',
+    CSV: 'text/csv; charset=utf-8',
+}
+
+MODELS = {
+    POSTS: Post,
+    COMMENTS: Comment,
+    FOLLOWS: Follow,
+}
+# Поле записи -> выражение для values_list
+FIELDS = {
+    POSTS: (
+        ('id', 'pk'),
+        ('author', 'author__username'),
+        ('group', 'group__slug'),
+        ('text', 'text'),
+        ('pub_date', 'pub_date'),
+    ),
+    COMMENTS: (
+        ('id', 'pk'),
+        ('post', 'post_id'),
+        ('author', 'author__username'),
+        ('text', 'text'),
+        ('created', 'created'),
+    ),
+    FOLLOWS: (
+        ('id', 'pk'),
+        ('user', 'user__username'),
+        ('author', 'author__username'),
+    ),
+}
+# Дата, от которой считается выгрузка с since; у подписок ее нет
+WATERMARKS = {
+    POSTS: 'pub_date',
+    COMMENTS: 'created',
+}
+
+
+def parse_since(value):
+    """Метка since из строки ISO 8601; ValueError для неверной."""
+    since = parse_datetime(value)
+    if since is None:
+        raise ValueError(f'Неверная дата {value!r}')
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def _after(keys, values):
+    """Строки после values по ключу keys, с внешним условием
+    по дате для поиска по индексу, как в CursorPaginator.
+    """
+    if len(keys) == 1:
+        return Q(**{f'{keys[0]}__gt': values[0]})
+    (date_key, id_key), (date, pk) = keys, values
+    return Q(**{f'{date_key}__gte': date}) & (
+        Q(**{f'{date_key}__gt': date}) | Q(**{f'{id_key}__gt': pk})
+    )
+
+
+def _keyset(queryset, keys, lookups, chunk_size):
+    """Строки values_list пачками по возрастанию keys; каждая пачка
+    начинается после последней строки предыдущей.
+    """
+    positions = [lookups.index(key) for key in keys]
+    queryset = queryset.order_by(*keys)
+    rows = list(queryset[:chunk_size])
+    while rows:
+        yield rows
+        last = [rows[-1][position] for position in positions]
+        rows = list(queryset.filter(_after(keys, last))[:chunk_size])
+
+
+def chunks(kind, since=None, chunk_size=CHUNK_SIZE):
+    """Записи-словари пачками по возрастанию даты и id.
+
+    С since выгружаются только записи с датой позже since;
+    ValueError, если у записей kind нет даты.
+    """
+    names, lookups = zip(*FIELDS[kind])
+    date = WATERMARKS.get(kind)
+    queryset = MODELS[kind].objects.values_list(*lookups)
+    if since is not None:
+        if date is None:
+            raise ValueError(f'У записей {kind} нет даты для since')
+        queryset = queryset.filter(**{f'{date}__gt': since})
+    keys = (date, 'pk') if date else ('pk',)
+    return (
+        [dict(zip(names, row)) for row in rows]
+        for rows in _keyset(queryset, keys, lookups, chunk_size)
+    )
+
+
+def _value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+class _Echo:
+    """Файл для csv.writer, который возвращает записанное."""
+
+    def write(self, value):
+        return value
+
+
+def _csv(kind, records):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(name for name, _ in FIELDS[kind])
+    for chunk in records:
+        yield ''.join(
+            writer.writerow(
+                '' if value is None else _value(value)
+                for value in record.values()
+            )
+            for record in chunk
+        )
+
+
+def _jsonl(records):
+    for chunk in records:
+        yield ''.join(
+            json.dumps(record, ensure_ascii=False, default=_value) + '\n'
+            for record in chunk
+        )
+
+
+def export(kind, format=JSONL, since=None, chunk_size=CHUNK_SIZE):
+    """Текст выгрузки по строке на пачку записей, в CSV — после
+    заголовка. Неверный since отвергается сразу, до первой строки.
+    """
+    records = chunks(kind, since, chunk_size)
+    if format == CSV:
+        return _csv(kind, records)
+    return _jsonl(records)
@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth import get_user_model
 
+from . import uploads
 from .models import Comment, Post
 
 User = get_user_model()
@@ -26,6 +27,13 @@ class PostForm(forms.ModelForm):
             )
         return data
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        # Новая загрузка, а не уже сохраненная картинка поста
+        if hasattr(image, 'content_type'):
+            return uploads.normalize(image)
+        return image
+
 
 # Класс для создания комментария к посту
 class CommentForm(forms.ModelForm):
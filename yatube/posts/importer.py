@@ -0,0 +1,306 @@
+"""Загрузка постов, комментариев и подписок потоком записей.
+
+Записи читаются по одной из JSONL или CSV и вставляются bulk_create
+пачками по BATCH_SIZE, каждая пачка в своей транзакции. Сигналы
+моделей при этом не срабатывают, поэтому поисковый индекс и теги
+обновляются в транзакции пачки, а счетчики, ленты подписок и кеш —
+один раз после загрузки. Если загрузка прервалась, счетчики
+пересчитывает rebuild_counters.
+"""
+import csv
+import json
+import re
+from contextlib import contextmanager
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import cache, counters, search, tags, timeline
+from .models import Comment, Follow, Group, Post, User
+
+BATCH_SIZE = 1000
+
+POSTS = 'posts'
+COMMENTS = 'comments'
+FOLLOWS = 'follows'
+KINDS = (POSTS, COMMENTS, FOLLOWS)
+
+JSONL = 'jsonl'
+CSV = 'csv'
+FORMATS = (JSONL, CSV)
+
+# Поля-id: целое или строка из цифр; остальные поля — строки
+ID_FIELDS = ('id', 'post')
+TEXT_FIELDS = ('author', 'user', 'group', 'text', 'pub_date', 'created')
+DIGITS = re.compile(r'\d+')
+
+
+def _json(line):
+    """Словарь из строки JSONL; None для битой строки."""
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def read(stream, format=JSONL):
+    """Записи-словари из потока строк JSONL или CSV с заголовком.
+    Вместо битой строки JSONL отдается None, и Importer ее пропускает.
+    """
+    if format == CSV:
+        return csv.DictReader(stream)
+    return (_json(line) for line in stream if line.strip())
+
+
+def _id(value):
+    """id из поля записи или None, если поле пустое."""
+    return int(value) if value else None
+
+
+def _valid(record):
+    """Подходят ли типы полей записи; значения проверяет Importer."""
+    if not isinstance(record, dict):
+        return False
+    for field in ID_FIELDS:
+        value = record.get(field)
+        if not value or (
+            type(value) is int and value >= 0
+            or isinstance(value, str) and DIGITS.fullmatch(value)
+        ):
+            continue
+        return False
+    return all(
+        isinstance(record.get(field), (str, type(None)))
+        for field in TEXT_FIELDS
+    )
+
+
+class Lookup:
+    """Соответствие ключ → id. Ключи, которых еще не было, дочитываются
+    из базы одним запросом на пачку; ненайденные запоминаются как None.
+    """
+
+    def __init__(self, queryset, field):
+        self.queryset = queryset
+        self.field = field
+        self.ids = {}
+
+    def resolve(self, keys):
+        missing = {key for key in keys if key and key not in self.ids}
+        if not missing:
+            return
+        self.ids.update(dict.fromkeys(missing))
+        self.ids.update(self.queryset.filter(
+            **{f'{self.field}__in': missing}
+        ).values_list(self.field, 'pk'))
+
+    def __getitem__(self, key):
+        """id по ключу; ValueError, если такого нет."""
+        pk = self.ids.get(key)
+        if pk is None:
+            raise ValueError(f'{self.field}={key!r} не найден')
+        return pk
+
+
+@contextmanager
+def _explicit_dates(model):
+    """bulk_create заполняет поля auto_now и auto_now_add текущим
+    временем; на время загрузки даты берутся из записей.
+    """
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _assign_pks(model, objs):
+    """bulk_create на SQLite не возвращает id. Строки без id вставлены
+    последними, и пока транзакция пачки держит блокировку записи,
+    им принадлежат наибольшие id таблицы.
+    """
+    missing = [obj for obj in objs if obj.pk is None]
+    if not missing:
+        return
+    pks = model.objects.order_by('-pk').values_list(
+        'pk', flat=True
+    )[:len(missing)]
+    for obj, pk in zip(missing, sorted(pks)):
+        obj.pk = pk
+
+
+def _date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise ValueError(f'неверная дата {value!r}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def _text(value):
+    if not value or not value.strip():
+        raise ValueError('пустой текст')
+    return value
+
+
+class Importer:
+    """Загрузка записей одного вида: run() после каждой пачки отдает
+    число загруженных и пропущенных записей.
+
+    Запись с неизвестным автором, группой или постом, пустым текстом,
+    неверной датой или уже занятым id пропускается, как и битая строка
+    или запись с полями не тех типов.
+    Если пачка упала, счетчики и кеш все равно поправляются
+    для загруженных до нее пачек.
+    """
+
+    def __init__(self, kind=POSTS, batch_size=BATCH_SIZE):
+        self.kind = kind
+        self.batch_size = batch_size
+        self.users = Lookup(User.objects, 'username')
+        self.groups = Lookup(Group.objects, 'slug')
+        self.posts = Lookup(Post.objects, 'pk')
+        # id постов, уже занятые в базе или в загружаемой пачке
+        self.taken = set()
+        self.loaded = 0
+        self.skipped = 0
+        # Что поправить после загрузки
+        self.user_ids = set()
+        self.post_ids = set()
+        self.namespaces = set()
+
+    def run(self, records):
+        model, build, load = {
+            POSTS: (Post, self._post, self._load_posts),
+            COMMENTS: (Comment, self._comment, self._load_comments),
+            FOLLOWS: (Follow, self._follow, self._load_follows),
+        }[self.kind]
+        records = iter(records)
+        try:
+            with _explicit_dates(model):
+                while True:
+                    chunk = list(islice(records, self.batch_size))
+                    if not chunk:
+                        break
+                    yield self._batch(chunk, build, load)
+        finally:
+            self._finish()
+
+    def _batch(self, chunk, build, load):
+        records = [record for record in chunk if _valid(record)]
+        self.skipped += len(chunk) - len(records)
+        self._resolve(records)
+        objs = []
+        for record in records:
+            try:
+                objs.append(build(record))
+            except (AttributeError, KeyError, TypeError, ValueError):
+                self.skipped += 1
+        with transaction.atomic():
+            load(objs)
+        self.loaded += len(objs)
+        return self.loaded, self.skipped
+
+    def _resolve(self, chunk):
+        self.users.resolve(
+            record.get(field) for record in chunk
+            for field in ('author', 'user')
+        )
+        if self.kind == POSTS:
+            self.groups.resolve(record.get('group') for record in chunk)
+            self.taken.update(Post.objects.filter(pk__in=[
+                _id(record.get('id')) for record in chunk
+                if record.get('id')
+            ]).values_list('pk', flat=True))
+        if self.kind == COMMENTS:
+            self.posts.resolve(_id(record.get('post')) for record in chunk)
+
+    def _post(self, record):
+        group = record.get('group') or None
+        pub_date = _date(record.get('pub_date'))
+        pk = _id(record.get('id'))
+        if pk in self.taken:
+            raise ValueError(f'id={pk} уже занят')
+        post = Post(
+            pk=pk,
+            author_id=self.users[record['author']],
+            group_id=self.groups[group] if group else None,
+            text=_text(record['text']),
+            pub_date=pub_date,
+            updated=pub_date,
+        )
+        if pk is not None:
+            self.taken.add(pk)
+        self.namespaces.add(cache.profile_namespace(record['author']))
+        if group:
+            self.namespaces.add(cache.group_namespace(group))
+        return post
+
+    def _comment(self, record):
+        return Comment(
+            post_id=self.posts[_id(record['post'])],
+            author_id=self.users[record['author']],
+            text=_text(record['text']),
+            created=_date(record.get('created')),
+        )
+
+    def _follow(self, record):
+        follow = Follow(
+            user_id=self.users[record['user']],
+            author_id=self.users[record['author']],
+        )
+        if follow.user_id == follow.author_id:
+            raise ValueError('подписка на себя')
+        self.namespaces.add(cache.profile_namespace(record['user']))
+        self.namespaces.add(cache.profile_namespace(record['author']))
+        return follow
+
+    def _load_posts(self, posts):
+        Post.objects.bulk_create(posts)
+        _assign_pks(Post, posts)
+        search.index(*posts)
+        tags.index((post.pk, post.text, post.pub_date) for post in posts)
+        self.user_ids.update(post.author_id for post in posts)
+
+    def _load_comments(self, comments):
+        Comment.objects.bulk_create(comments)
+        self.post_ids.update(comment.post_id for comment in comments)
+
+    def _load_follows(self, follows):
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        for follow in follows:
+            timeline.backfill(follow.user_id, follow.author_id)
+            self.user_ids.update((follow.user_id, follow.author_id))
+            self.namespaces.add(cache.follow_namespace(follow.user_id))
+
+    def _finish(self):
+        if self.kind == POSTS and self.user_ids:
+            self.namespaces.add(cache.INDEX)
+            # Загруженные посты попадают в ленты подписчиков авторов
+            authors = sorted(self.user_ids)
+            for start in range(0, len(authors), self.batch_size):
+                batch = authors[start:start + self.batch_size]
+                follows = Follow.objects.filter(
+                    author_id__in=batch
+                ).values_list('user_id', 'author_id')
+                for user_id, author_id in follows.iterator():
+                    timeline.backfill(user_id, author_id)
+                timeline.touch_followers(batch)
+        counters.rebuild_users(self.user_ids)
+        counters.rebuild_posts(self.post_ids)
+        self.namespaces.update(map(cache.post_namespace, self.post_ids))
+        cache.bump(*self.namespaces)
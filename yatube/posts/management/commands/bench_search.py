@@ -0,0 +1,133 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+SYLLABLES = (
+    'ка', 'ро', 'ли', 'ме', 'на', 'то', 'ве', 'су', 'пи', 'до',
+    'ры', 'за', 'бо', 'ше', 'ль', 'ст', 'ни', 'мо', 'гу', 'та',
+)
+BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет поиск по синтетическому корпусу постов во временной '
+        'базе SQLite: индекс FTS5 из posts.search против LIKE \'%...%\', '
+        'которым раньше искала админка. Частоты слов распределены '
+        'по закону Ципфа. Рабочая база не затрагивается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--words-per-post', type=int, default=30)
+        parser.add_argument('--vocabulary', type=int, default=50_000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument(
+            '--like-queries',
+            type=int,
+            default=20,
+            help='Запросов LIKE меньше: каждый читает всю таблицу.',
+        )
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        words = self.vocabulary(rng, options['vocabulary'])
+        cum_weights = list(self.zipf(len(words)))
+        with tempfile.TemporaryDirectory() as directory:
+            db = sqlite3.connect(os.path.join(directory, 'bench.sqlite3'))
+            db.execute('PRAGMA journal_mode = off')
+            db.execute('PRAGMA synchronous = off')
+            db.execute('CREATE TABLE posts (id INTEGER PRIMARY KEY, text)')
+            db.execute(search.CREATE_TABLE.format(table=search.TABLE))
+
+            started = time.perf_counter()
+            self.fill(db, rng, words, cum_weights, options)
+            self.report_time('Корпус', started)
+            started = time.perf_counter()
+            db.execute(
+                f'INSERT INTO {search.TABLE} (rowid, text) '
+                'SELECT id, text FROM posts'
+            )
+            db.commit()
+            self.report_time('Индекс FTS5', started)
+
+            def query():
+                return ' '.join(rng.choices(
+                    words, cum_weights=cum_weights, k=rng.randint(1, 2)
+                ))
+
+            self.report('FTS5', [
+                self.timed(db, search.RANKED.replace('%s', '?'), (
+                    *[search.match_query(query())] * 2,
+                    search.RANK_WINDOW - 1,
+                    search.MAX_RESULTS,
+                ))
+                for _ in range(options['queries'])
+            ])
+            self.report('LIKE', [
+                self.timed(
+                    db,
+                    'SELECT id FROM posts WHERE text LIKE ? '
+                    'ORDER BY id DESC LIMIT ?',
+                    (f'%{query()}%', search.MAX_RESULTS),
+                )
+                for _ in range(options['like_queries'])
+            ])
+            db.close()
+
+    @staticmethod
+    def vocabulary(rng, size):
+        words = set()
+        while len(words) < size:
+            words.add(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 5))))
+        # Частота слова не должна зависеть от его начала
+        words = sorted(words)
+        rng.shuffle(words)
+        return words
+
+    @staticmethod
+    def zipf(size):
+        total = 0
+        for rank in range(1, size + 1):
+            total += 1 / rank
+            yield total
+
+    def fill(self, db, rng, words, cum_weights, options):
+        per_post = options['words_per_post']
+        for start in range(0, options['posts'], BATCH_SIZE):
+            count = min(BATCH_SIZE, options['posts'] - start)
+            text = rng.choices(words, cum_weights=cum_weights,
+                               k=count * per_post)
+            db.executemany('INSERT INTO posts (text) VALUES (?)', (
+                (' '.join(text[i:i + per_post]),)
+                for i in range(0, len(text), per_post)
+            ))
+        db.commit()
+
+    @staticmethod
+    def timed(db, sql, params):
+        started = time.perf_counter()
+        db.execute(sql, params).fetchall()
+        return time.perf_counter() - started
+
+    def report_time(self, name, started):
+        self.stdout.write(f'{name}: {time.perf_counter() - started:.1f} с')
+
+    def report(self, name, timings):
+        if len(timings) < 2:
+            return
+        percentiles = statistics.quantiles(timings, n=100)
+        self.stdout.write(
+            f'{name}: {len(timings)} запросов, '
+            f'p50 {percentiles[49] * 1000:.1f} мс, '
+            f'p95 {percentiles[94] * 1000:.1f} мс, '
+            f'p99 {percentiles[98] * 1000:.1f} мс'
+        )
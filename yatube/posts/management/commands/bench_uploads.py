@@ -0,0 +1,70 @@
+import resource
+import threading
+import time
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from posts import uploads
+
+
+def peak_rss_mb():
+    # ru_maxrss в Linux — в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_jpeg(width, height):
+    content = BytesIO()
+    Image.new('RGB', (width, height), color=(120, 80, 40)).save(
+        content, 'JPEG', quality=90
+    )
+    return content.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        'Нормализует одну большую JPEG-картинку из нескольких потоков '
+        'одновременно и печатает время и пиковую память процесса.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--width', type=int, default=6000)
+        parser.add_argument('--height', type=int, default=4000)
+
+    def handle(self, *args, **options):
+        content = make_jpeg(options['width'], options['height'])
+        before = peak_rss_mb()
+        errors = []
+
+        def worker():
+            upload = SimpleUploadedFile('photo.jpg', content, 'image/jpeg')
+            try:
+                uploads.normalize(upload).close()
+            except Exception as error:
+                errors.append(error)
+
+        started = time.perf_counter()
+        threads = [
+            threading.Thread(target=worker)
+            for _ in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        full_decode = options['width'] * options['height'] * 3 / 2 ** 20
+        self.stdout.write(
+            f'Картинка {options["width"]}x{options["height"]}, '
+            f'{len(content) / 2 ** 20:.1f} МБ в файле, '
+            f'{full_decode:.0f} МБ при полном декодировании\n'
+            f'Потоков: {options["threads"]}, время: {elapsed:.2f} с\n'
+            f'Пиковая память процесса: {before:.0f} -> '
+            f'{peak_rss_mb():.0f} МБ'
+        )
+        for error in errors:
+            self.stdout.write(self.style.ERROR(str(error)))
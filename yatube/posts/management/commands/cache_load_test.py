@@ -0,0 +1,76 @@
+import threading
+import time
+from collections import Counter
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory, override_settings
+
+from posts import views
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает главную страницу из нескольких потоков с коротким '
+        'сроком жизни кеша и печатает число запросов к базе по секундам: '
+        'при защите от лавины оно не растет на границах истечения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=int, default=5)
+        parser.add_argument(
+            '--timeout',
+            type=int,
+            default=1,
+            help='Срок жизни кеша лент и страниц на время теста, с.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.time()
+        stop = started + options['seconds']
+        queries = Counter()
+        requests = Counter()
+        lock = threading.Lock()
+
+        def count_query(execute, sql, params, many, context):
+            with lock:
+                queries[int(time.time() - started)] += 1
+            return execute(sql, params, many, context)
+
+        def worker():
+            factory = RequestFactory()
+            try:
+                with connection.execute_wrapper(count_query):
+                    while time.time() < stop:
+                        request = factory.get('/')
+                        request.user = AnonymousUser()
+                        views.index(request)
+                        with lock:
+                            requests[int(time.time() - started)] += 1
+            finally:
+                connection.close()
+
+        timeout = options['timeout']
+        with override_settings(
+            FEED_CACHE_TIMEOUT=timeout, PAGE_CACHE_TIMEOUT=timeout
+        ):
+            threads = [
+                threading.Thread(target=worker)
+                for _ in range(options['threads'])
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write('секунда  запросов страниц  запросов к базе')
+        for second in sorted(requests):
+            self.stdout.write(
+                f'{second:7}  {requests[second]:16}  {queries[second]:15}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Больше всего запросов к базе за секунду: '
+            f'{max(queries.values(), default=0)}'
+        ))
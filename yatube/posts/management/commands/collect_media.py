@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from posts import storage
+
+LABELS = {
+    storage.THUMBNAILS: 'Миниатюры удаленных картинок',
+    storage.IMAGE: 'Картинки без постов',
+    storage.STRAY_THUMBNAIL: 'Файлы миниатюр без записей в KVStore',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки, на которые не ссылается ни один пост, '
+        'и их миниатюры. Каталоги и KVStore читаются порциями.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать, ничего не удаляя.',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=60 * 60,
+            help='Не трогать файлы моложе стольких секунд.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+        )
+
+    def handle(self, *args, **options):
+        found = {kind: [0, 0] for kind in LABELS}
+        for kind, name, size, delete in storage.garbage(
+            options['min_age'], options['batch_size']
+        ):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{name} ({filesizeformat(size)})')
+            if not options['dry_run']:
+                delete()
+            found[kind][0] += 1
+            found[kind][1] += size
+        for kind, (count, size) in found.items():
+            self.stdout.write(
+                f'{LABELS[kind]}: {count}, {filesizeformat(size)}'
+            )
+        total = sum(size for _, size in found.values())
+        if options['dry_run']:
+            message = f'Можно освободить: {total} байт'
+        else:
+            message = f'Освобождено: {total} байт'
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,105 @@
+import re
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts.models import (
+    Comment, Follow, Mention, Post, PostTag, TimelineEntry
+)
+from posts.utils import NEXT, CursorPaginator, encode_cursor
+
+PER_PAGE = 10
+FULL_SCAN = re.compile(r'\bSCAN\b(?!.*\bUSING\b)')
+SORT = re.compile(r'TEMP B-TREE')
+
+
+def feed_querysets():
+    """Запросы лент в том виде, в каком их выполняют view-функции:
+    первая страница и страница глубоко в ленте.
+    """
+    boundary = SimpleNamespace(pub_date=timezone.now(), id=1, post_id=1)
+    feeds = {
+        'index': (Post.objects.with_related(), ('pub_date', 'id')),
+        'group_posts': (
+            Post.objects.with_related().filter(group_id=1),
+            ('pub_date', 'id'),
+        ),
+        'profile': (
+            Post.objects.with_related().filter(author_id=1),
+            ('pub_date', 'id'),
+        ),
+        'follow_index': (
+            TimelineEntry.objects.filter(user_id=1).select_related(
+                'post__author', 'post__group'
+            ),
+            ('pub_date', 'post_id'),
+        ),
+        'tag_posts': (
+            PostTag.objects.filter(tag_id=1).select_related(
+                'post__author', 'post__group'
+            ),
+            ('pub_date', 'post_id'),
+        ),
+        'mentions': (
+            Mention.objects.filter(user_id=1).select_related(
+                'post__author', 'post__group'
+            ),
+            ('pub_date', 'post_id'),
+        ),
+    }
+    for name, (queryset, keys) in feeds.items():
+        paginator = CursorPaginator(queryset, PER_PAGE, keys)
+        cursor = encode_cursor(NEXT, boundary, keys)
+        yield f'{name}: первая страница', paginator.page_queryset()
+        yield f'{name}: глубокая страница', paginator.page_queryset(cursor)
+    yield 'post_detail: комментарии', Comment.objects.filter(
+        post_id=1
+    ).select_related('author')
+    yield 'profile: подписка', Follow.objects.filter(
+        user_id=1, author_id=1
+    )
+
+
+def plan_problems(plan):
+    """Полные проходы таблиц и сортировки во временном B-дереве."""
+    return [
+        line for line in plan.splitlines()
+        if FULL_SCAN.search(line) or SORT.search(line)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает планы запросов лент (EXPLAIN) и отмечает '
+        'полные проходы таблиц и сортировки без индекса.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--strict',
+            action='store_true',
+            help='Завершиться с ошибкой, если план не использует индекс.',
+        )
+
+    def handle(self, *args, **options):
+        failed = []
+        for name, queryset in feed_querysets():
+            plan = queryset.explain()
+            problems = plan_problems(plan)
+            self.stdout.write(name)
+            for line in plan.splitlines():
+                self.stdout.write(f'    {line}')
+            if problems:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(
+                    '    -> полный проход или сортировка'
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    '    -> поиск по индексу'
+                ))
+        if failed and options['strict']:
+            raise CommandError(
+                'Запросы без индекса: ' + ', '.join(failed)
+            )
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import exporter, importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии или подписки в JSONL или CSV '
+        'пачками по ключу (дата, id), не загружая таблицу в память. '
+        'С --since выгружаются только записи позже этой даты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default='-',
+            help='Файл для выгрузки; «-» — стандартный вывод.',
+        )
+        parser.add_argument(
+            '--kind', choices=importer.KINDS, default=importer.POSTS
+        )
+        parser.add_argument(
+            '--format',
+            choices=importer.FORMATS,
+            help='По умолчанию определяется по расширению файла.',
+        )
+        parser.add_argument(
+            '--since',
+            help='Дата ISO 8601: pub_date постов или created комментариев.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=exporter.CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or (
+            importer.CSV if path.endswith('.csv') else importer.JSONL
+        )
+        try:
+            since = options['since'] and exporter.parse_since(
+                options['since']
+            )
+            content = exporter.export(
+                options['kind'], format, since or None,
+                options['chunk_size'],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        if path == '-':
+            for text in content:
+                self.stdout.write(text, ending='')
+            return
+        with open(path, 'w', newline='', encoding='utf-8') as stream:
+            for text in content:
+                stream.write(text)
@@ -0,0 +1,61 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает посты, комментарии или подписки из JSONL или CSV '
+        '(файла или стандартного ввода) пачками bulk_create. Авторы '
+        'и группы задаются именем и slug и должны уже существовать.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default='-',
+            help='Файл с записями; «-» — стандартный ввод.',
+        )
+        parser.add_argument(
+            '--kind', choices=importer.KINDS, default=importer.POSTS
+        )
+        parser.add_argument(
+            '--format',
+            choices=importer.FORMATS,
+            help='По умолчанию определяется по расширению файла.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=importer.BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or (
+            importer.CSV if path.endswith('.csv') else importer.JSONL
+        )
+        if path == '-':
+            self.load(sys.stdin, format, options)
+        else:
+            with open(path, newline='', encoding='utf-8') as stream:
+                self.load(stream, format, options)
+
+    def load(self, stream, format, options):
+        loader = importer.Importer(options['kind'], options['batch_size'])
+        started = time.perf_counter()
+        loaded = skipped = 0
+        for loaded, skipped in loader.run(importer.read(stream, format)):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'Загружено: {loaded}, пропущено: {skipped}, '
+                f'{loaded / elapsed:.0f} записей/с',
+                ending='\r',
+            )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено: {loaded}, пропущено: {skipped} '
+            f'за {elapsed:.1f} с'
+        ))
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import cache
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает попадания и промахи кеша страниц для гостей. '
+        'Счетчики общие для процессов, если кеш общий (Redis, Memcached).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Обнулить счетчики после вывода.',
+        )
+
+    def handle(self, *args, **options):
+        hits, misses = cache.page_stats()
+        total = hits + misses
+        ratio = hits / total if total else 0
+        self.stdout.write(
+            f'Срок жизни страницы: {settings.PAGE_CACHE_TIMEOUT} с\n'
+            f'Попаданий: {hits}\n'
+            f'Промахов: {misses}\n'
+            f'Доля попаданий: {ratio:.1%}'
+        )
+        if options['reset']:
+            cache.reset_page_stats()
+            self.stdout.write(self.style.SUCCESS('Счетчики обнулены'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счетчики постов, комментариев и подписок '
+        'по данным в базе.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            counters.rebuild_users()
+            counters.rebuild_posts()
+        self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts import tags
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново раскладывает хештеги и упоминания всех постов '
+        'пачками, каждую в своей транзакции. Нужен после миграции '
+        'и для постов, загруженных в обход сохранения модели.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=tags.BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        done = 0
+        for done in tags.reindex(options['batch_size']):
+            self.stdout.write(f'Обработано постов: {done}', ending='\r')
+        self.stdout.write(self.style.SUCCESS(
+            f'Теги и упоминания разложены для постов: {done}'
+        ))
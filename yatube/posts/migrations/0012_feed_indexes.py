@@ -0,0 +1,68 @@
+# Generated by Django 2.2.16 on 2026-10-17 21:16
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(model, field):
+    rows = model.objects.filter(**{field: OuterRef('user_id')}).order_by(
+    ).values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(rows), 0)
+
+
+def delete_duplicate_follows(apps, schema_editor):
+    """Перед уникальным ограничением оставляет одну подписку
+    из каждой группы дублей и пересчитывает счетчики подписок.
+    """
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    duplicates = Follow.objects.values('user_id', 'author_id').order_by(
+    ).annotate(first=Min('id'), total=Count('id')).filter(total__gt=1)
+    users = set()
+    for row in duplicates:
+        Follow.objects.filter(
+            user_id=row['user_id'], author_id=row['author_id']
+        ).exclude(id=row['first']).delete()
+        users.update((row['user_id'], row['author_id']))
+    UserStats.objects.filter(user_id__in=users).update(
+        followers_count=_count(Follow, 'author_id'),
+        following_count=_count(Follow, 'user_id'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            delete_duplicate_follows, migrations.RunPython.noop
+        ),
+        migrations.AlterModelOptions(
+            name='timelineentry',
+            options={'ordering': ['-pub_date', '-post_id']},
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-created'], name='posts_comment_post_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date', '-id'], name='posts_post_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='posts_post_author_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='posts_post_group_feed_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='posts_follow_unique'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 2.2.16 on 2026-10-17 21:45
+
+from django.db import migrations, models
+from django.db.models import Count
+import posts.storage
+
+
+def count_refs(apps, schema_editor):
+    """Прежние файлы остаются на местах и учитываются по именам."""
+    Post = apps.get_model('posts', 'Post')
+    MediaBlob = apps.get_model('posts', 'MediaBlob')
+    MediaBlob.objects.bulk_create(
+        [
+            MediaBlob(name=row['image'], refs=row['refs'])
+            for row in Post.objects.exclude(image='').order_by().values(
+                'image'
+            ).annotate(refs=Count('pk')).iterator()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_image_size'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Имя файла')),
+                ('refs', models.PositiveIntegerField(default=0, verbose_name='Число ссылок')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(count_refs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+def create_search(apps, schema_editor):
+    """Поисковый индекс FTS5 есть только у SQLite."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_search USING fts5('
+        "text, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    # Как search.index: «ё» хранится как «е»
+    schema_editor.execute(
+        'INSERT INTO posts_search (rowid, text) '
+        "SELECT id, replace(replace(text, 'ё', 'е'), 'Ё', 'Е') FROM posts_post"
+    )
+
+
+def drop_search(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_image_placeholder'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search, drop_search),
+    ]
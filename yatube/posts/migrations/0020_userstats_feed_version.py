@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-17 22:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_tags_and_mentions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='feed_version',
+            field=models.PositiveIntegerField(default=0, verbose_name='Версия ленты подписок'),
+        ),
+    ]
@@ -1,9 +1,17 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+    def with_related(self):
+        """Подгружает автора и группу поста в том же запросе."""
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст поста',
@@ -13,6 +21,10 @@ class Post(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True
     )
+    updated = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -31,14 +43,65 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    # Размеры самого крупного варианта картинки (posts/thumbnails.py):
+    # по ним браузер резервирует место до загрузки
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    # Размытая копия картинки (posts/uploads.py) видна сразу,
+    # без отдельного запроса
+    image_placeholder = models.TextField(
+        'Заглушка картинки',
+        blank=True,
+        editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Число комментариев',
+        default=0,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def card_version(self):
+        """Версия карточки поста для ключа кеша: меняется при
+        каждом сохранении.
+        """
+        return f'{self.pk}-{self.updated.timestamp():.6f}'
+
     class Meta:
         ordering = ['-pub_date']
+        # Индексы повторяют порядок лент (pub_date, id) по убыванию
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='posts_post_feed_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='posts_post_author_feed_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='posts_post_group_feed_idx',
+            ),
+        ]
 
 
 class Comment(models.Model):
@@ -69,6 +132,17 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', '-created'],
+                name='posts_comment_post_idx',
+            ),
+            # Список и даты комментариев в админке
+            models.Index(
+                fields=['-created'],
+                name='posts_comment_created_idx',
+            ),
+        ]
 
 
 class Group(models.Model):
@@ -99,3 +173,187 @@ class Follow(models.Model):
         related_name='following',
         verbose_name='Автор, на которого подписываются'
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='posts_follow_unique',
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Счетчики пользователя, которые поддерживаются при записи,
+    чтобы страницы не считали их агрегатными запросами.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Число постов',
+        default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Число подписчиков',
+        default=0
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name='Число подписок',
+        default=0
+    )
+    # Входит в ключ кеша ленты подписок; запись автора сдвигает ее
+    # у всех подписчиков одним UPDATE, а не по ключу на подписчика
+    feed_version = models.PositiveIntegerField(
+        verbose_name='Версия ленты подписок',
+        default=0
+    )
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class TimelineEntry(models.Model):
+    """Запись ленты подписок: пост автора, на которого подписан user.
+
+    Заполняется при публикации поста, поэтому лента читается
+    одним проходом по индексу (user, pub_date, post).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель ленты'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации поста'
+    )
+
+    class Meta:
+        ordering = ['-pub_date', '-post_id']
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='posts_timeline_feed_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='posts_timeline_unique_post',
+            ),
+        ]
+
+
+class MediaBlob(models.Model):
+    """Файл в хранилище по содержимому и число постов,
+    которые на него ссылаются.
+    """
+    name = models.CharField(
+        verbose_name='Имя файла',
+        max_length=255,
+        primary_key=True
+    )
+    refs = models.PositiveIntegerField(
+        verbose_name='Число ссылок',
+        default=0
+    )
+
+    def __str__(self):
+        return self.name
+
+
+class Tag(models.Model):
+    """Хештег из текстов постов, в нижнем регистре."""
+    name = models.CharField(
+        verbose_name='Тег',
+        max_length=64,
+        unique=True
+    )
+
+    def __str__(self):
+        return self.name
+
+
+class PostTag(models.Model):
+    """Хештег поста.
+
+    Дата поста повторена здесь, поэтому лента тега читается одним
+    проходом по индексу (tag, pub_date, post).
+    """
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='entries',
+        verbose_name='Тег'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='tag_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации поста'
+    )
+
+    class Meta:
+        ordering = ['-pub_date', '-post_id']
+        indexes = [
+            models.Index(
+                fields=['tag', '-pub_date', '-post'],
+                name='posts_posttag_feed_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'tag'],
+                name='posts_posttag_unique_tag',
+            ),
+        ]
+
+
+class Mention(models.Model):
+    """Упоминание пользователя в тексте поста (@username),
+    с тем же индексом ленты, что у PostTag.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='mentions',
+        verbose_name='Упомянутый пользователь'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='mentions',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации поста'
+    )
+
+    class Meta:
+        ordering = ['-pub_date', '-post_id']
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='posts_mention_feed_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'user'],
+                name='posts_mention_unique_user',
+            ),
+        ]
@@ -0,0 +1,113 @@
+"""Полнотекстовый поиск по постам.
+
+Тексты постов копируются в виртуальную таблицу SQLite FTS5
+posts_search, rowid которой совпадает с id поста; сигналы сохранения
+и удаления поста обновляют ее в той же транзакции. Каждое слово
+запроса ищется как префикс: «кот» найдет и «котиками», а «ё»
+в индексе и запросах заменяется на «е». Результаты упорядочены
+по bm25, но ранжируются только RANK_WINDOW самых новых совпадений:
+иначе запрос из частого слова считал бы bm25 для большей части
+корпуса (bench_search).
+
+На других СУБД таблицы нет, и поиск сводится к icontains.
+"""
+import re
+
+from django.db import connection
+
+TABLE = 'posts_search'
+# Та же таблица создается миграцией 0017_post_search
+CREATE_TABLE = (
+    'CREATE VIRTUAL TABLE {table} USING fts5('
+    "text, tokenize = 'unicode61 remove_diacritics 2')"
+)
+# Выдается не больше MAX_RESULTS лучших постов
+MAX_RESULTS = 1000
+RANK_WINDOW = 5000
+# Новые посты идут с большими rowid, и FTS5 перебирает совпадения
+# в порядке rowid дешево, без ранжирования
+RANKED = (
+    f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s AND rowid >= '
+    f'COALESCE((SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s '
+    'ORDER BY rowid DESC LIMIT 1 OFFSET %s), 0) '
+    'ORDER BY rank LIMIT %s'
+)
+MAX_WORDS = 10
+WORD = re.compile(r'\w+')
+
+
+def enabled():
+    return connection.vendor == 'sqlite'
+
+
+def _fold(text):
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def match_query(text):
+    """Запрос FTS5 из слов text или None, если слов нет."""
+    words = WORD.findall(_fold(text))[:MAX_WORDS]
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def index(*posts):
+    """Заносит в индекс текущие тексты постов."""
+    if not enabled() or not posts:
+        return
+    remove(*(post.pk for post in posts))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)',
+            [(post.pk, _fold(post.text)) for post in posts],
+        )
+
+
+def remove(*post_ids):
+    if not enabled() or not post_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABLE} WHERE rowid IN '
+            f'({", ".join(["%s"] * len(post_ids))})',
+            post_ids,
+        )
+
+
+def ranked_ids(text, limit=MAX_RESULTS):
+    """id постов, подходящих под запрос, от самых релевантных."""
+    from .models import Post
+
+    query = match_query(text)
+    if query is None:
+        return []
+    if not enabled():
+        return list(Post.objects.filter(
+            text__icontains=text
+        ).order_by('-pub_date').values_list('id', flat=True)[:limit])
+    with connection.cursor() as cursor:
+        cursor.execute(RANKED, [query, query, RANK_WINDOW - 1, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def filter_posts(queryset, text):
+    """Посты queryset, подходящие под запрос, в порядке queryset."""
+    query = match_query(text)
+    if query is None:
+        return queryset.none()
+    if not enabled():
+        return queryset.filter(text__icontains=text)
+    # pk__in=RawSQL(...) дает IN ((SELECT ...)), и SQLite берет из
+    # такого подзапроса только первую строку
+    meta = queryset.model._meta
+    column = '.'.join(map(connection.ops.quote_name, (
+        meta.db_table, meta.pk.column
+    )))
+    return queryset.extra(
+        where=[
+            f'{column} IN (SELECT rowid FROM {TABLE} '
+            f'WHERE {TABLE} MATCH %s)'
+        ],
+        params=[query],
+    )
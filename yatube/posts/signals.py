@@ -0,0 +1,181 @@
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_save
+)
+from django.dispatch import receiver
+
+from . import cache, counters, search, storage, tags, timeline
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def _follow_namespaces(follow):
+    """Лента подписчика и профили обоих: в них видны счетчики
+    подписок и кнопка подписки.
+    """
+    namespaces = [cache.follow_namespace(follow.user_id)]
+    for field in ('user', 'author'):
+        try:
+            user = getattr(follow, field)
+        except User.DoesNotExist:
+            continue
+        namespaces.append(cache.profile_namespace(user.username))
+    return namespaces
+
+
+def _post_namespaces(post, group_ids=()):
+    """Пространства кеша, в которых виден пост."""
+    namespaces = [cache.INDEX, cache.post_namespace(post.pk)]
+    try:
+        namespaces.append(cache.profile_namespace(post.author.username))
+    except User.DoesNotExist:
+        pass
+    group_ids = {group_id for group_id in group_ids if group_id}
+    namespaces.extend(
+        cache.group_namespace(slug) for slug in Group.objects.filter(
+            pk__in=group_ids
+        ).values_list('slug', flat=True)
+    )
+    return namespaces
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    """Запоминает группу и картинку поста, чтобы при переносе
+    в другую группу сбросить кеш обеих, а при замене картинки
+    отпустить прежний файл.
+    """
+    instance._loaded_group_id = instance.group_id
+    # Картинка нового поста еще не сохранена в хранилище; значение
+    # берется мимо дескриптора, чтобы не загружать отложенное поле
+    image = instance.__dict__.get('image') if instance.pk else None
+    instance._loaded_image = getattr(image, 'name', image) or ''
+
+
+@receiver(pre_save, sender=Post)
+def set_image_placeholder(sender, instance, raw=False, **kwargs):
+    """Новая картинка приходит с заглушкой из uploads.normalize.
+    Заглушку картинки, попавшей в пост в обход формы, позже построит
+    thumbnails.generate.
+    """
+    image = instance.image
+    if raw or (image.name or '') == instance._loaded_image:
+        return
+    instance.image_placeholder = ''
+    if image and not image._committed:
+        instance.image_placeholder = getattr(image.file, 'placeholder', '')
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    """У нового пользователя сразу появляются нулевые счетчики."""
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    """Новый пост попадает в ленты подписчиков автора,
+    а измененный сбрасывает кеш лент, где он виден. Ленты подписок
+    устаревают одним запросом на всех подписчиков.
+    """
+    if raw:
+        return
+    namespaces = _post_namespaces(
+        instance, (instance.group_id, instance._loaded_group_id)
+    )
+    instance._loaded_group_id = instance.group_id
+    if (instance.image.name or '') != instance._loaded_image:
+        storage.retain(instance.image.name)
+        storage.release(instance._loaded_image)
+        instance._loaded_image = instance.image.name or ''
+    if created:
+        counters.change_user(instance.author_id, posts_count=1)
+        timeline.fan_out(instance)
+    else:
+        # Текст, группа и картинка поста видны и в лентах подписок
+        timeline.touch_followers([instance.author_id])
+    cache.bump(*namespaces)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, update_fields=None, **kwargs):
+    """Новый или измененный текст поста попадает в поисковый индекс."""
+    if update_fields is None or 'text' in update_fields:
+        search.index(instance)
+
+
+@receiver(post_save, sender=Post)
+def index_tags(sender, instance, update_fields=None, **kwargs):
+    """Теги и упоминания из нового или измененного текста поста;
+    с удаленным постом они удаляются каскадом.
+    """
+    if update_fields is None or 'text' in update_fields:
+        tags.index([(instance.pk, instance.text, instance.pub_date)])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    """Удаленный пост уменьшает счетчик постов автора
+    и сбрасывает кеш лент, где он был виден.
+    """
+    counters.change_user(instance.author_id, posts_count=-1)
+    storage.release(instance.image.name)
+    cache.bump(*_post_namespaces(instance, (instance.group_id,)))
+    # Ленты подписок, в которых был пост, читаются из TimelineEntry,
+    # а их записи удаляются каскадом вместе с постом.
+    timeline.touch_followers([instance.author_id])
+
+
+@receiver(post_save, sender=Group)
+def change_group(sender, instance, raw=False, **kwargs):
+    """Измененные название и описание видны на странице группы."""
+    if not raw:
+        cache.bump(cache.group_namespace(instance.slug))
+
+
+@receiver(post_delete, sender=Group)
+def forget_group(sender, instance, **kwargs):
+    """Посты удаленной группы остаются на главной без ссылки на нее."""
+    cache.bump(cache.INDEX, cache.group_namespace(instance.slug))
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    """Новый комментарий увеличивает счетчик комментариев поста."""
+    if created and not raw:
+        counters.change_comments(instance.post_id, 1)
+        cache.bump(cache.post_namespace(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    """Удаленный комментарий уменьшает счетчик комментариев поста."""
+    counters.change_comments(instance.post_id, -1)
+    cache.bump(cache.post_namespace(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    """После подписки растут счетчики и в ленту добавляются
+    посты автора.
+    """
+    if created and not raw:
+        counters.change_user(instance.user_id, following_count=1)
+        counters.change_user(instance.author_id, followers_count=1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        cache.bump(*_follow_namespaces(instance))
+
+
+@receiver(post_delete, sender=Follow)
+def purge_timeline(sender, instance, **kwargs):
+    """После отписки уменьшаются счетчики и посты автора
+    убираются из ленты.
+    """
+    counters.change_user(instance.user_id, following_count=-1)
+    counters.change_user(instance.author_id, followers_count=-1)
+    timeline.purge(instance.user_id, instance.author_id)
+    cache.bump(*_follow_namespaces(instance))
@@ -0,0 +1,266 @@
+"""Хранилище картинок постов по содержимому.
+
+Имя файла — sha256 его содержимого, поэтому одинаковая картинка,
+загруженная многими пользователями, хранится один раз, а миниатюры
+sorl-thumbnail, ключом которых служит имя исходного файла, строятся
+для нее тоже один раз. Сколько постов ссылается на файл, считает
+MediaBlob; последний отпустивший файл удаляет его вместе с миниатюрами.
+
+garbage() находит то, что осталось без ссылок в обход этого учета:
+картинки без постов, миниатюры удаленных картинок и файлы миниатюр,
+забытые KVStore. Каталоги и KVStore читаются порциями.
+"""
+import hashlib
+import itertools
+import logging
+import os
+import time
+from functools import partial
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import deserialize
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix, del_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+logger = logging.getLogger(__name__)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище с именами по sha256 содержимого."""
+
+    def save(self, name, content, max_length=None):
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        name = '/'.join(filter(None, (
+            os.path.dirname(name), digest[:2], digest[2:4], digest + extension
+        )))
+        # Такое содержимое уже хранится: второй копии не нужно
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+
+def retain(name):
+    """Еще один пост ссылается на файл name."""
+    from .models import MediaBlob
+
+    if not name:
+        return
+    updated = MediaBlob.objects.filter(name=name).update(refs=F('refs') + 1)
+    if not updated:
+        MediaBlob.objects.create(name=name, refs=1)
+
+
+def release(name, count=1):
+    """count постов больше не ссылаются на файл name; файл без ссылок
+    удаляется после фиксации транзакции.
+    """
+    from .models import MediaBlob
+
+    if not name:
+        return
+    MediaBlob.objects.filter(name=name).update(
+        refs=Greatest(F('refs') - count, 0)
+    )
+    deleted, _ = MediaBlob.objects.filter(name=name, refs__lte=0).delete()
+    if deleted:
+        transaction.on_commit(lambda: delete_file(name))
+
+
+def delete_file(name):
+    """Удаляет файл и его миниатюры, если на него снова не сослались."""
+    from .models import MediaBlob, Post
+
+    if MediaBlob.objects.filter(name=name).exists():
+        return
+    # Миниатюры в KVStore привязаны к файлу вместе с его хранилищем
+    image = ImageFile(name, Post._meta.get_field('image').storage)
+    try:
+        default.kvstore.delete(image)
+        image.delete()
+    except (OSError, SuspiciousFileOperation):
+        # Неудачная уборка не должна ломать запрос: файл просто
+        # останется на диске без ссылок
+        logger.exception('Файл %s не удален', name)
+
+
+# Виды того, что выдает garbage()
+IMAGE = 'image'
+THUMBNAILS = 'thumbnails'
+STRAY_THUMBNAIL = 'stray_thumbnail'
+
+
+def _walk(path):
+    """Файлы каталога и его подкаталогов по одному."""
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _walk(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _old_files(storage, path, min_age, batch_size):
+    """Порции {имя в хранилище: размер} файлов старше min_age секунд.
+
+    Свежие файлы пропускаются: их пост может быть еще не сохранен.
+    """
+    top = storage.path(path)
+    if not os.path.isdir(top):
+        return
+    root = storage.path('')
+    cutoff = time.time() - min_age
+    for batch in _batches(_walk(top), batch_size):
+        files = {}
+        for entry in batch:
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime < cutoff:
+                name = os.path.relpath(entry.path, root)
+                files[name.replace(os.sep, '/')] = stat.st_size
+        yield files
+
+
+def _keys(prefix, batch_size):
+    """Порции ключей KVStore с префиксом. Обход идет по ключу, поэтому
+    удаление уже выданных записей его не сбивает.
+    """
+    keys = KVStoreModel.objects.filter(
+        key__startswith=prefix
+    ).order_by('key').values_list('key', flat=True)
+    batch = list(keys[:batch_size])
+    while batch:
+        yield batch
+        batch = list(keys.filter(key__gt=batch[-1])[:batch_size])
+
+
+def _values(keys):
+    return dict(KVStoreModel.objects.filter(
+        key__in=keys
+    ).values_list('key', 'value'))
+
+
+def _image_key(key):
+    """Ключ исходника по ключу списка его миниатюр."""
+    return add_prefix(del_prefix(key))
+
+
+def _size(image):
+    try:
+        return image.storage.size(image.name)
+    except OSError:
+        return 0
+
+
+def _delete_image(storage, name):
+    from .models import MediaBlob
+
+    MediaBlob.objects.filter(name=name).delete()
+    storage.delete(name)
+
+
+def _live(names):
+    """Имена из names, на которые ссылаются посты."""
+    from .models import Post
+
+    return set(Post.objects.filter(
+        image__in=list(names)
+    ).values_list('image', flat=True))
+
+
+def _orphan_thumbnails(storage, batch_size):
+    """Миниатюры картинок без постов, в том числе построенные
+    от прежнего хранилища картинок.
+    """
+    for batch in _keys(add_prefix('', 'thumbnails'), batch_size):
+        lists = _values(batch)
+        images = _values([_image_key(key) for key in lists])
+        sources = {
+            key: deserialize_image_file(images[_image_key(key)])
+            for key in lists if _image_key(key) in images
+        }
+        alive = _live(source.name for source in sources.values())
+        for key, source in sources.items():
+            if (
+                source.name in alive
+                # Хранилище исходника обернуто в LazyObject,
+                # который подменяет __class__
+                and source.storage.__class__ is storage.__class__
+            ):
+                continue
+            thumbnails = _values([
+                add_prefix(thumbnail) for thumbnail in deserialize(lists[key])
+            ])
+            size = sum(
+                _size(deserialize_image_file(value))
+                for value in thumbnails.values()
+            )
+            yield THUMBNAILS, source.name, size, partial(
+                default.kvstore.delete, source
+            )
+
+
+def _orphan_images(field, min_age, batch_size):
+    for files in _old_files(
+        field.storage, field.upload_to, min_age, batch_size
+    ):
+        alive = _live(files)
+        for name, size in files.items():
+            if name not in alive:
+                yield IMAGE, name, size, partial(
+                    _delete_image, field.storage, name
+                )
+
+
+def _stray_thumbnails(min_age, batch_size):
+    """Файлы миниатюр, о которых KVStore не знает."""
+    for files in _old_files(
+        default.storage, sorl_settings.THUMBNAIL_PREFIX, min_age, batch_size
+    ):
+        keys = {
+            add_prefix(ImageFile(name, default.storage).key): name
+            for name in files
+        }
+        known = _values(keys)
+        for key, name in keys.items():
+            if key not in known:
+                yield STRAY_THUMBNAIL, name, files[name], partial(
+                    default.storage.delete, name
+                )
+
+
+def garbage(min_age, batch_size):
+    """Все, на что не ссылается ни один пост.
+
+    Выдает (вид, имя, размер в байтах, функция удаления) по одному,
+    поэтому удалять можно прямо по ходу обхода.
+    """
+    from .models import Post
+
+    field = Post._meta.get_field('image')
+    return itertools.chain(
+        _orphan_thumbnails(field.storage, batch_size),
+        _orphan_images(field, min_age, batch_size),
+        _stray_thumbnails(min_age, batch_size),
+    )
@@ -0,0 +1,84 @@
+"""Хештеги (#тег) и упоминания (@username) в текстах постов.
+
+Они раскладываются в таблицы PostTag и Mention при сохранении поста,
+поэтому ленты тега и упоминаний не ищут их в Post.text.
+"""
+import re
+
+from django.db import transaction
+
+from .models import Mention, Post, PostTag, Tag, User
+
+BATCH_SIZE = 500
+
+# Решетка после & — это сущность HTML (&#39;), а не тег
+TAG_RE = re.compile(r'(?<![\w&])#(\w+)')
+# Точка, плюс и дефис допустимы в имени, но не в его конце
+MENTION_RE = re.compile(r'(?<![\w.+@-])@([\w.+-]*\w)')
+MAX_TAG_LENGTH = Tag._meta.get_field('name').max_length
+
+
+def extract(text):
+    """Теги и имена пользователей из текста."""
+    tags = {
+        tag.lower() for tag in TAG_RE.findall(text)
+        if len(tag) <= MAX_TAG_LENGTH
+    }
+    return tags, set(MENTION_RE.findall(text))
+
+
+def _tag_ids(names):
+    Tag.objects.bulk_create(
+        [Tag(name=name) for name in names],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    return dict(Tag.objects.filter(name__in=names).values_list('name', 'pk'))
+
+
+def index(posts):
+    """Заново раскладывает теги и упоминания постов
+    [(id, текст, дата публикации)].
+    """
+    extracted = [
+        (pk, pub_date, *extract(text)) for pk, text, pub_date in posts
+    ]
+    post_ids = [pk for pk, *_ in extracted]
+    PostTag.objects.filter(post_id__in=post_ids).delete()
+    Mention.objects.filter(post_id__in=post_ids).delete()
+    tag_ids = _tag_ids(set().union(*(tags for *_, tags, _ in extracted)))
+    user_ids = dict(User.objects.filter(
+        username__in=set().union(*(names for *_, names in extracted))
+    ).values_list('username', 'pk'))
+    PostTag.objects.bulk_create(
+        [
+            PostTag(tag_id=tag_ids[tag], post_id=pk, pub_date=pub_date)
+            for pk, pub_date, tags, _ in extracted
+            for tag in tags
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    Mention.objects.bulk_create(
+        [
+            Mention(user_id=user_ids[name], post_id=pk, pub_date=pub_date)
+            for pk, pub_date, _, names in extracted
+            for name in names
+            if name in user_ids
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+
+def reindex(batch_size=BATCH_SIZE):
+    """Раскладывает теги всех постов пачками, каждую в своей
+    транзакции, и после каждой пачки отдает число обработанных постов.
+    """
+    posts = Post.objects.order_by('pk').values_list('pk', 'text', 'pub_date')
+    done = 0
+    batch = list(posts[:batch_size])
+    while batch:
+        with transaction.atomic():
+            index(batch)
+        done += len(batch)
+        yield done
+        batch = list(posts.filter(pk__gt=batch[-1][0])[:batch_size])
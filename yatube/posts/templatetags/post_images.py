@@ -0,0 +1,35 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+# Карточка занимает всю ширину экрана до 960 пикселей
+SIZES = '(min-width: 960px) 960px, 100vw'
+
+
+def _srcset(urls, image_format):
+    return ', '.join(
+        f'{urls[image_format, width]} {width}w'
+        for width in thumbnails.WIDTHS
+    )
+
+
+@register.inclusion_tag('includes/post_image.html')
+def post_image(post, loading='lazy', sizes=SIZES):
+    """Картинка поста с вариантами для разных экранов.
+
+    Пока варианты не построены, выводится заглушка тех же пропорций.
+    Картинку в начале страницы стоит грузить сразу: loading='eager'.
+    """
+    context = {'post': post, 'loading': loading, 'sizes': sizes}
+    if not post.image:
+        return context
+    urls = thumbnails.sources(post)
+    if urls is not None:
+        context.update(
+            webp_srcset=_srcset(urls, 'WEBP'),
+            jpeg_srcset=_srcset(urls, 'JPEG'),
+            src=urls['JPEG', max(thumbnails.WIDTHS)],
+        )
+    return context
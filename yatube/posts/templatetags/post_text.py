@@ -0,0 +1,36 @@
+from django import template
+from django.urls import reverse
+from django.utils.html import conditional_escape, format_html
+from django.utils.safestring import mark_safe
+
+from .. import tags
+
+register = template.Library()
+
+
+@register.filter(needs_autoescape=True)
+def link_tags(text, autoescape=True):
+    """Хештеги и упоминания в тексте поста — ссылки на ленту тега
+    и профиль пользователя.
+    """
+    if autoescape:
+        text = conditional_escape(text)
+
+    def tag_link(match):
+        if len(match[1]) > tags.MAX_TAG_LENGTH:
+            return match[0]
+        return format_html(
+            '<a href="{}">{}</a>',
+            reverse('posts:tag_posts', args=[match[1].lower()]),
+            mark_safe(match[0]),
+        )
+
+    def mention_link(match):
+        return format_html(
+            '<a href="{}">{}</a>',
+            reverse('posts:profile', args=[match[1]]),
+            mark_safe(match[0]),
+        )
+
+    text = tags.TAG_RE.sub(tag_link, text)
+    return mark_safe(tags.MENTION_RE.sub(mention_link, text))
@@ -0,0 +1,101 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import utils
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+CHANGELISTS = (
+    'admin:posts_post_changelist',
+    'admin:posts_comment_changelist',
+    'admin:posts_follow_changelist',
+)
+
+
+class AdminChangeListTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        start = Post.objects.count()
+        for number in range(start, start + count):
+            user = User.objects.create_user(username=f'user{number}')
+            group = Group.objects.create(
+                title=f'Группа {number}', slug=f'group{number}'
+            )
+            post = Post.objects.create(
+                author=user, text=f'Пост {number}', group=group
+            )
+            Comment.objects.create(post=post, author=user, text='Коммент')
+            Follow.objects.create(user=user, author=self.admin)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries.captured_queries)
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Число запросов списка не зависит от числа строк на странице."""
+        self.add_rows(3)
+        counts = {
+            name: self.count_queries(reverse(name)) for name in CHANGELISTS
+        }
+        self.add_rows(10)
+        for name in CHANGELISTS:
+            with self.subTest(name=name):
+                self.assertEqual(
+                    self.count_queries(reverse(name)), counts[name]
+                )
+
+    def test_editable_group_renders_only_selected(self):
+        """В строке списка только выбранная группа, а не все группы."""
+        self.add_rows(3)
+        post = Post.objects.select_related('group').first()
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertContains(
+            response,
+            f'<option value="{post.group.pk}" selected>{post.group}</option>',
+            html=True,
+        )
+        self.assertContains(response, f'>{post.group}</option>', count=1)
+
+    def test_estimated_count(self):
+        """Без фильтров число строк оценивается по наибольшему id,
+        с фильтром считается точно.
+        """
+        self.add_rows(3)
+        last = Post.objects.order_by('-pk').first()
+        Post.objects.exclude(pk=last.pk).delete()
+        url = reverse('admin:posts_post_changelist')
+        with mock.patch.object(utils, 'ESTIMATE_THRESHOLD', 0):
+            response = self.client.get(url)
+            self.assertEqual(response.context['cl'].result_count, last.pk)
+            response = self.client.get(url, {'q': 'Пост'})
+            self.assertEqual(response.context['cl'].result_count, 1)
+        self.assertEqual(
+            self.client.get(url).context['cl'].result_count, 1
+        )
+
+    def test_date_hierarchy(self):
+        """Навигация по датам фильтрует список."""
+        self.add_rows(2)
+        year = Post.objects.first().pub_date.year
+        url = reverse('admin:posts_post_changelist')
+        response = self.client.get(url, {'pub_date__year': year})
+        self.assertEqual(response.context['cl'].result_count, 2)
+        response = self.client.get(url, {'pub_date__year': year - 1})
+        self.assertEqual(response.context['cl'].result_count, 0)
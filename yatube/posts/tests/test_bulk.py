@@ -0,0 +1,122 @@
+from unittest import mock
+
+from django.contrib.admin import helpers
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import bulk, cache, search
+from ..models import (
+    Comment, Follow, Group, Post, PostTag, TimelineEntry, UserStats
+)
+
+User = get_user_model()
+
+
+@mock.patch.object(bulk, 'BATCH_SIZE', 2)
+class BulkActionsTest(TestCase):
+    """Массовые действия админки идут пачками и поправляют все,
+    что обычно поправляют сигналы.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.old = Group.objects.create(title='Старая', slug='old')
+        cls.new = Group.objects.create(title='Новая', slug='new')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.posts = [
+            Post.objects.create(
+                author=self.author,
+                text=f'Кот номер {number} #кот',
+                group=self.old,
+            )
+            for number in range(5)
+        ]
+        self.kept = Post.objects.create(author=self.other, text='Кот другой')
+        Follow.objects.create(user=self.other, author=self.author)
+        for post in (*self.posts, self.kept):
+            Comment.objects.create(post=post, author=self.other, text='Да')
+
+    def run_action(self, name, action, selected, **data):
+        url = reverse(f'admin:posts_{name}_changelist')
+        data = {
+            'action': action,
+            helpers.ACTION_CHECKBOX_NAME: [obj.pk for obj in selected],
+            **data,
+        }
+        response = self.client.post(url, {**data, 'index': 0})
+        self.assertTemplateUsed(response, 'admin/posts/bulk_action.html')
+        return self.client.post(url, {**data, 'apply': 1}, follow=True)
+
+    def test_move_to_group(self):
+        """Посты переносятся в группу, кеш обеих групп и лент
+        подписчиков автора сбрасывается.
+        """
+        namespaces = (
+            cache.group_namespace('old'), cache.group_namespace('new')
+        )
+        before = cache.generations(*namespaces)
+        stats = UserStats.objects.get(user=self.other)
+        response = self.run_action(
+            'post', 'move_to_group', self.posts[:3], group=self.new.pk
+        )
+        self.assertContains(response, 'Перенесено постов: 3')
+        self.assertEqual(self.new.posts.count(), 3)
+        self.assertEqual(self.old.posts.count(), 2)
+        after = cache.generations(*namespaces)
+        self.assertTrue(all(a != b for a, b in zip(before, after)))
+        self.assertGreater(
+            UserStats.objects.get(user=self.other).feed_version,
+            stats.feed_version,
+        )
+
+    def test_move_across_selection(self):
+        """«Выбрать все» переносит все посты по фильтрам списка."""
+        response = self.run_action(
+            'post', 'move_to_group', self.posts[:1], select_across=1
+        )
+        self.assertContains(response, 'Перенесено постов: 6')
+        self.assertFalse(Post.objects.filter(group__isnull=False).exists())
+
+    def test_delete_by_author(self):
+        """Удаляются все посты автора с комментариями, записями лент,
+        тегами, поисковым индексом и счетчиками.
+        """
+        response = self.run_action(
+            'post', 'delete_by_author', self.posts[:1]
+        )
+        self.assertContains(response, 'Удалено постов: 5')
+        self.assertEqual(list(Post.objects.all()), [self.kept])
+        self.assertEqual(list(Comment.objects.values_list(
+            'post_id', flat=True
+        )), [self.kept.pk])
+        for model in (TimelineEntry, PostTag):
+            self.assertFalse(model.objects.exclude(post=self.kept).exists())
+        self.assertEqual(search.ranked_ids('кот'), [self.kept.pk])
+        self.assertEqual(UserStats.objects.get(
+            user=self.author
+        ).posts_count, 0)
+        self.assertEqual(UserStats.objects.get(
+            user=self.other
+        ).posts_count, 1)
+
+    def test_purge_comments(self):
+        """Комментарии удаляются, счетчики постов пересчитываются."""
+        self.client.get(reverse('posts:post_detail', args=[self.kept.pk]))
+        comments = Comment.objects.filter(post__in=self.posts[:3])
+        response = self.run_action('comment', 'purge', comments)
+        self.assertContains(response, 'Удалено комментариев: 3')
+        self.assertEqual(Comment.objects.count(), 3)
+        counts = dict(Post.objects.values_list('pk', 'comments_count'))
+        self.assertEqual(
+            [counts[post.pk] for post in self.posts], [0, 0, 0, 1, 1]
+        )
+        self.assertEqual(counts[self.kept.pk], 1)
@@ -0,0 +1,73 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from .. import cache as posts_cache
+
+THREADS = 8
+
+
+class GetOrBuildTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+        self.lock = threading.Lock()
+
+    def build(self):
+        with self.lock:
+            self.builds += 1
+        time.sleep(0.2)
+        return 'страница'
+
+    def run_threads(self):
+        results = []
+
+        def worker():
+            value, _ = posts_cache.get_or_build('key', self.build, 60)
+            results.append(value)
+
+        threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_single_flight_on_miss(self):
+        """Пустой ключ строит один поток, остальные ждут его значение."""
+        results = self.run_threads()
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(results, ['страница'] * THREADS)
+
+    def test_stale_value_while_rebuilding(self):
+        """Пока устаревшее значение пересчитывается,
+        остальные потоки отдают прежнее.
+        """
+        cache.set('key', ('старая', 0.2, time.time() - 1), 60)
+        results = self.run_threads()
+        self.assertEqual(self.builds, 1)
+        self.assertIn('старая', results)
+        self.assertEqual(posts_cache.get_or_build('key', self.build, 60), (
+            'страница', False
+        ))
+
+    def test_early_recompute(self):
+        """XFetch: при неудачном броске пересчет начинается до срока,
+        а при обычном значение отдается из кеша.
+        """
+        cache.set('key', ('старая', 1.0, time.time() + 2), 60)
+        with mock.patch.object(posts_cache.random, 'random', return_value=0):
+            self.assertEqual(
+                posts_cache.get_or_build('key', self.build, 60),
+                ('старая', False),
+            )
+        with mock.patch.object(
+            posts_cache.random, 'random', return_value=0.99
+        ):
+            self.assertEqual(
+                posts_cache.get_or_build('key', self.build, 60),
+                ('страница', True),
+            )
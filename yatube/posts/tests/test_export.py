@@ -0,0 +1,130 @@
+import csv
+import json
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import exporter, importer
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.staff = User.objects.create_user(
+            username='staff', is_staff=True
+        )
+        cls.group = Group.objects.create(title='Группа', slug='group')
+
+    def setUp(self):
+        start = timezone.now() - timedelta(days=10)
+        self.posts = []
+        for number in range(5):
+            post = Post.objects.create(
+                author=self.author,
+                text=f'Пост {number}',
+                group=self.group if number % 2 else None,
+            )
+            # Даты идут не в порядке id
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=start + timedelta(days=(number * 3) % 5)
+            )
+            post.refresh_from_db()
+            self.posts.append(post)
+        Comment.objects.create(
+            post=self.posts[0], author=self.reader, text='Коммент'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def export(self, *args):
+        stdout = StringIO()
+        call_command('export_posts', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_posts_in_chunks(self):
+        """Посты выгружаются пачками по дате и id: запрос на пачку
+        и еще один, чтобы узнать, что строк больше нет.
+        """
+        with self.assertNumQueries(4):
+            text = ''.join(exporter.export(importer.POSTS, chunk_size=2))
+        records = [json.loads(line) for line in text.splitlines()]
+        expected = sorted(self.posts, key=lambda post: post.pub_date)
+        self.assertEqual(
+            [record['id'] for record in records],
+            [post.pk for post in expected],
+        )
+        self.assertEqual(records[1], {
+            'id': expected[1].pk,
+            'author': 'author',
+            'group': expected[1].group and 'group',
+            'text': expected[1].text,
+            'pub_date': expected[1].pub_date.isoformat(),
+        })
+
+    def test_round_trip(self):
+        """Выгрузку загружает обратно import_posts."""
+        text = self.export('--chunk-size', 2)
+        expected = list(Post.objects.values_list(
+            'pk', 'author', 'group', 'text', 'pub_date'
+        ))
+        Post.objects.all().delete()
+        list(importer.Importer().run(importer.read(StringIO(text))))
+        self.assertEqual(list(Post.objects.values_list(
+            'pk', 'author', 'group', 'text', 'pub_date'
+        )), expected)
+
+    def test_since(self):
+        """С since выгружаются только записи позже метки."""
+        since = self.posts[2].pub_date
+        text = self.export('--since', since.isoformat())
+        self.assertEqual(
+            {json.loads(line)['id'] for line in text.splitlines()},
+            {post.pk for post in self.posts if post.pub_date > since},
+        )
+        text = self.export(
+            '--kind', 'comments', '--format', 'csv',
+            '--since', (timezone.now() + timedelta(days=1)).isoformat(),
+        )
+        self.assertEqual(text, 'id,post,author,text,created\r\n')
+        with self.assertRaises(CommandError):
+            self.export('--kind', 'follows', '--since', '2020-01-01')
+        with self.assertRaises(CommandError):
+            self.export('--since', 'вчера')
+
+    def test_view(self):
+        """Выгрузка по адресу доступна только сотрудникам."""
+        url = reverse('posts:export')
+        data = {'kind': 'follows', 'format': 'csv'}
+        self.assertEqual(Client().get(url, data).status_code, 302)
+        client = Client()
+        client.force_login(self.reader)
+        self.assertEqual(client.get(url, data).status_code, 302)
+        client.force_login(self.staff)
+        response = client.get(url, data)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(
+            b''.join(response.streaming_content).decode().splitlines()
+        ))
+        follow = Follow.objects.get()
+        self.assertEqual(rows, [
+            ['id', 'user', 'author'],
+            [str(follow.pk), 'reader', 'author'],
+        ])
+        for bad in (
+            {'kind': 'users'},
+            {'format': 'xml'},
+            {'since': 'вчера'},
+            {'kind': 'follows', 'since': '2020-01-01'},
+        ):
+            with self.subTest(bad=bad):
+                self.assertEqual(client.get(url, bad).status_code, 400)
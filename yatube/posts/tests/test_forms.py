@@ -1,8 +1,10 @@
 import shutil
 import tempfile
+from io import BytesIO
 from django.contrib.auth import get_user_model
 from django .core.files.uploadedfile import SimpleUploadedFile
 from http import HTTPStatus
+from PIL import Image
 
 from ..forms import PostForm
 from ..models import Comment, Group, Post
@@ -18,7 +20,7 @@ TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
 # временная папка TEMP_MEDIA_ROOT для сохранения media-файлов
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostCreateFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -101,7 +103,8 @@ class PostCreateFormTests(TestCase):
                 text=form_data['text'],
                 group=form_data['group'],
                 author=self.post.author,
-                image=f'posts/{uploaded.name}',
+                # Имя файла — sha256 содержимого после нормализации
+                image__regex=r'^posts/\w{2}/\w{2}/\w{64}\.gif$',
             ).exists()
         )
 
@@ -162,3 +165,69 @@ class PostCreateFormTests(TestCase):
                 author=self.post.author,
             ).exists()
         )
+
+    @staticmethod
+    def jpeg_upload(size, name='photo.jpg'):
+        image = Image.new('RGB', size, color=(200, 10, 10))
+        exif = Image.Exif()
+        # Orientation: повернуть на 90 градусов
+        exif[0x0112] = 6
+        content = BytesIO()
+        image.save(content, 'JPEG', exif=exif)
+        return SimpleUploadedFile(
+            name=name, content=content.getvalue(), content_type='image/jpeg'
+        )
+
+    @override_settings(MAX_IMAGE_SIDE=100)
+    def test_upload_normalized(self):
+        """Картинка поворачивается по EXIF, уменьшается
+        и сохраняется без метаданных.
+        """
+        form = PostForm(
+            data={'text': 'Фото'},
+            files={'image': self.jpeg_upload((400, 200))},
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        form.instance.author = self.user
+        post = form.save()
+        with Image.open(post.image.path) as saved:
+            self.assertEqual(saved.size, (50, 100))
+            self.assertNotIn('exif', saved.info)
+
+    def test_upload_placeholder(self):
+        """Заглушка строится при загрузке и сбрасывается вместе
+        с картинкой.
+        """
+        form = PostForm(
+            data={'text': 'Фото'},
+            files={'image': self.jpeg_upload((400, 200))},
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        form.instance.author = self.user
+        post = form.save()
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,')
+        )
+        post.refresh_from_db()
+        post.text = 'Новый текст'
+        post.save()
+        self.assertTrue(post.image_placeholder)
+        post.image = None
+        post.save()
+        self.assertEqual(post.image_placeholder, '')
+
+    def test_upload_limits(self):
+        """Слишком большие файлы и картинки отклоняются до декодирования."""
+        limits = {
+            'MAX_UPLOAD_SIZE': 100,
+            'MAX_IMAGE_PIXELS': 100 * 100,
+        }
+        for setting, limit in limits.items():
+            with self.subTest(setting=setting):
+                with override_settings(**{setting: limit}):
+                    form = PostForm(
+                        data={'text': 'Фото'},
+                        files={'image': self.jpeg_upload((200, 200))},
+                    )
+                    self.assertFalse(form.is_valid())
+                    self.assertIn('image', form.errors)
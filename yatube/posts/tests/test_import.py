@@ -0,0 +1,165 @@
+import json
+from datetime import datetime
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from .. import search
+from ..models import Comment, Follow, Group, Post, TimelineEntry, UserStats
+
+User = get_user_model()
+
+
+class ImportPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+
+    def load(self, lines, *args):
+        stdout = StringIO()
+        with mock.patch('sys.stdin', StringIO(''.join(lines))):
+            call_command('import_posts', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def load_jsonl(self, records, *args):
+        return self.load(
+            [json.dumps(record) + '\n' for record in records], *args
+        )
+
+    def test_posts(self):
+        """Посты загружаются пачками с датами из записей, попадают
+        в индекс, теги, счетчики и ленты подписчиков.
+        """
+        Follow.objects.create(user=self.reader, author=self.author)
+        output = self.load_jsonl([
+            {'author': 'author', 'text': 'Старый #кот', 'group': 'group',
+             'pub_date': '2020-01-02T03:04:05'},
+            {'id': 1000, 'author': 'author', 'text': 'С id'},
+            {'author': 'author', 'text': 'Без даты'},
+            {'author': 'nobody', 'text': 'Чужой'},
+            {'author': 'author', 'text': 'Плохая дата', 'pub_date': 'x'},
+            {'author': 'author', 'text': 'Нет группы', 'group': 'none'},
+        ], '--batch-size', 2)
+        self.assertIn('Загружено: 3, пропущено: 3', output)
+        old = Post.objects.get(text='Старый #кот')
+        self.assertEqual(old.pub_date, timezone.make_aware(
+            datetime(2020, 1, 2, 3, 4, 5)
+        ))
+        self.assertEqual(old.group, self.group)
+        self.assertTrue(Post.objects.filter(pk=1000, text='С id').exists())
+        self.assertEqual(search.ranked_ids('старый'), [old.pk])
+        self.assertEqual(search.ranked_ids('дат'), [
+            Post.objects.get(text='Без даты').pk
+        ])
+        self.assertEqual(
+            list(old.tag_entries.values_list('tag__name', flat=True)),
+            ['кот'],
+        )
+        self.assertEqual(UserStats.objects.get(
+            user=self.author
+        ).posts_count, 3)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 3
+        )
+        self.assertEqual(
+            Post._meta.get_field('pub_date').auto_now_add, True
+        )
+
+    def test_comments_csv(self):
+        """Комментарии из CSV пересчитывают счетчики постов."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.load([
+            'post,author,text,created\n',
+            f'{post.pk},reader,Первый,2021-05-06T07:08:09+00:00\n',
+            f'{post.pk},reader,Второй,\n',
+            '999999,reader,К чужому,\n',
+        ], '--kind', 'comments', '--format', 'csv')
+        self.assertEqual(Comment.objects.count(), 2)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        self.assertEqual(
+            Comment.objects.get(text='Первый').created.year, 2021
+        )
+
+    def test_follows(self):
+        """Подписки наполняют ленты и счетчики; повтор не дублирует."""
+        Post.objects.create(author=self.author, text='Пост')
+        records = [
+            {'user': 'reader', 'author': 'author'},
+            {'user': 'reader', 'author': 'author'},
+            {'user': 'author', 'author': 'author'},
+        ]
+        self.load_jsonl(records, '--kind', 'follows')
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(TimelineEntry.objects.filter(
+            user=self.reader
+        ).count(), 1)
+        self.assertEqual(UserStats.objects.get(
+            user=self.author
+        ).followers_count, 1)
+
+    def test_bad_lines_and_taken_ids_skipped(self):
+        """Битые строки JSONL и занятые id пропускаются, а не
+        обрывают загрузку.
+        """
+        Post.objects.create(pk=500, author=self.author, text='Старый')
+        output = self.load([
+            '{"author": "author", "text": "Первый"}\n',
+            '{"author": "author", "text": \n',
+            '[1, 2]\n',
+            '{"id": 500, "author": "author", "text": "Занят"}\n',
+            '{"id": 600, "author": "author", "text": "Новый"}\n',
+            '{"id": 600, "author": "author", "text": "Повтор"}\n',
+        ], '--batch-size', 2)
+        self.assertIn('Загружено: 2, пропущено: 4', output)
+        self.assertEqual(Post.objects.get(pk=500).text, 'Старый')
+        self.assertEqual(Post.objects.get(pk=600).text, 'Новый')
+        self.assertEqual(UserStats.objects.get(
+            user=self.author
+        ).posts_count, 3)
+
+    def test_wrong_types_skipped(self):
+        """Записи с полями не тех типов пропускаются, а остальные
+        записи той же пачки загружаются.
+        """
+        Post.objects.create(pk=1, author=self.author, text='Старый')
+        output = self.load([
+            '{"author": "author", "text": 5}\n',
+            '{"author": ["author"], "text": "Список"}\n',
+            '{"id": 1.0, "author": "author", "text": "Дробный id"}\n',
+            '{"id": "2", "author": "author", "text": "Строковый id"}\n',
+            '{"author": "author", "text": "Обычный"}\n',
+        ], '--batch-size', 5)
+        self.assertIn('Загружено: 2, пропущено: 3', output)
+        self.assertEqual(Post.objects.get(pk=1).text, 'Старый')
+        self.assertEqual(Post.objects.get(pk=2).text, 'Строковый id')
+        self.assertEqual(Post.objects.count(), 3)
+
+    def test_counters_fixed_when_batch_fails(self):
+        """Если пачка упала, загруженные до нее посты попадают
+        в счетчики и ленты подписчиков.
+        """
+        Follow.objects.create(user=self.reader, author=self.author)
+        with mock.patch.object(
+            search, 'index', side_effect=[None, RuntimeError]
+        ), self.assertRaises(RuntimeError):
+            self.load_jsonl([
+                {'author': 'author', 'text': 'Первый'},
+                {'author': 'author', 'text': 'Второй'},
+            ], '--batch-size', 1)
+        self.assertEqual(list(
+            Post.objects.values_list('text', flat=True)
+        ), ['Первый'])
+        self.assertEqual(UserStats.objects.get(
+            user=self.author
+        ).posts_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 1
+        )
@@ -1,7 +1,12 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
 
-from ..models import Group, Post
+from ..models import Comment, Follow, Group, Post, UserStats
 
 User = get_user_model()
 
@@ -75,3 +80,101 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     post._meta.get_field(field).help_text, expected_value)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def assertStats(self, user, **expected):
+        stats = UserStats.objects.get(user=user)
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(stats, field), value)
+
+    def test_counters_follow_writes(self):
+        """Счетчики меняются при создании и удалении записей."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Post.objects.create(author=self.author, text='Еще пост')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertStats(self.author, posts_count=2, followers_count=1)
+        self.assertStats(self.reader, posts_count=0, following_count=1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+        comment.delete()
+        follow.delete()
+        post.delete()
+        self.assertStats(self.author, posts_count=1, followers_count=0)
+        self.assertStats(self.reader, following_count=0)
+
+    def test_rebuild_counters_command(self):
+        """Команда rebuild_counters восстанавливает счетчики."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.all().delete()
+        Post.objects.update(comments_count=0)
+
+        call_command('rebuild_counters', stdout=StringIO())
+
+        self.assertStats(self.author, posts_count=1, followers_count=1)
+        self.assertStats(self.reader, following_count=1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_follow_is_unique(self):
+        """Подписаться на автора дважды нельзя."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_missing_stats_rebuilt_on_read(self):
+        """Страницы пользователя без строки счетчиков (loaddata,
+        bulk_create) пересчитывают ее, а не падают.
+        """
+        post = Post.objects.create(author=self.author, text='Пост')
+        UserStats.objects.all().delete()
+        for url in (
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[post.pk]),
+        ):
+            with self.subTest(url=url):
+                UserStats.objects.all().delete()
+                response = self.client.get(url)
+                self.assertEqual(response.context['all_posts'], 1)
+        self.assertStats(self.author, posts_count=1)
+
+
+class UserDeleteTest(TransactionTestCase):
+    """Удаление пользователя проверяется с настоящими транзакциями:
+    внешние ключи SQLite проверяются при фиксации.
+    """
+
+    def test_delete_user_with_posts_and_follows(self):
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        Post.objects.create(author=author, text='Пост')
+        Follow.objects.create(user=reader, author=author)
+        Follow.objects.create(user=author, author=reader)
+        author.delete()
+        self.assertFalse(User.objects.filter(username='author').exists())
+        stats = UserStats.objects.get(user=reader)
+        self.assertEqual(
+            (stats.followers_count, stats.following_count), (0, 0)
+        )
+
+    def test_delete_user_with_only_follow(self):
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=author)
+        reader.delete()
+        self.assertEqual(UserStats.objects.get(
+            user=author
+        ).followers_count, 0)
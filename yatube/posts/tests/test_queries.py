@@ -0,0 +1,94 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import urls
+from ..models import Comment, Follow, Group, Post
+from .utils import QueryBudgetMixin
+
+User = get_user_model()
+
+POSTS_COUNT = 15
+
+# Бюджет запросов для каждого адреса приложения posts:
+# имя адреса -> (клиент, аргументы, наибольшее число запросов).
+# Новый адрес без бюджета роняет test_every_url_has_budget.
+# Авторизованный клиент тратит 2 запроса на сессию и пользователя,
+# transaction.atomic() в тестах добавляет SAVEPOINT и RELEASE.
+QUERY_BUDGETS = {
+    'index': ('guest', lambda data: (), 1),
+    'group_list': ('guest', lambda data: (data.group.slug,), 2),
+    'profile': ('guest', lambda data: (data.author.username,), 2),
+    'post_detail': ('guest', lambda data: (data.post.id,), 3),
+    'post_create': ('author', lambda data: (), 3),
+    'post_edit': ('author', lambda data: (data.post.id,), 4),
+    'add_comment': ('reader', lambda data: (data.post.id,), 3),
+    # Третий запрос — версия ленты из UserStats
+    'follow_index': ('reader', lambda data: (), 4),
+    # С запросом ?q= — в SearchTest.test_search_page
+    'search': ('guest', lambda data: (), 2),
+    # Гостя без сессии сразу отправляют на вход в админку
+    'export': ('guest', lambda data: (), 0),
+    'tag_posts': ('guest', lambda data: ('тест',), 2),
+    'mentions': ('guest', lambda data: (data.reader.username,), 2),
+    'profile_follow': ('reader', lambda data: (data.author.username,), 6),
+    'profile_unfollow': ('reader', lambda data: (data.author.username,), 11),
+}
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='Другое описание',
+        )
+        for i in range(POSTS_COUNT):
+            cls.post = Post.objects.create(
+                author=cls.author,
+                text=f'Тестовый пост {i} #тест для @reader',
+                group=(cls.group, other_group)[i % 2],
+            )
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text='Комментарий'
+            )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.clients = {
+            'guest': Client(),
+            'author': Client(),
+            'reader': Client(),
+        }
+        self.clients['author'].force_login(self.author)
+        self.clients['reader'].force_login(self.reader)
+
+    def test_every_url_has_budget(self):
+        """Для каждого адреса из posts/urls.py объявлен бюджет."""
+        names = {pattern.name for pattern in urls.urlpatterns}
+        self.assertEqual(names, set(QUERY_BUDGETS))
+
+    def test_urls_stay_within_budget(self):
+        """Страницы не выходят за объявленное число запросов."""
+        for name, (client, args, budget) in QUERY_BUDGETS.items():
+            with self.subTest(name=name):
+                url = reverse(f'{urls.app_name}:{name}', args=args(self))
+                self.assertQueryBudget(self.clients[client], url, budget)
+
+    def test_feed_plans_use_indexes(self):
+        """Запросы лент идут по индексам без полных проходов и сортировок."""
+        call_command('explain_feeds', strict=True, stdout=StringIO())
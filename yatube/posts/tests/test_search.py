@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Post
+from ..views import NUMBER_OF_POSTS
+from .utils import QueryBudgetMixin
+
+User = get_user_model()
+
+
+class SearchTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def create_post(self, text):
+        return Post.objects.create(author=self.user, text=text)
+
+    def test_index_follows_posts(self):
+        """Индекс обновляется при создании, изменении и удалении поста."""
+        post = self.create_post('Рыжий кот спит на диване')
+        self.assertEqual(search.ranked_ids('кот'), [post.pk])
+        post.text = 'Белая собака'
+        post.save()
+        self.assertEqual(search.ranked_ids('кот'), [])
+        self.assertEqual(search.ranked_ids('Собака'), [post.pk])
+        post.delete()
+        self.assertEqual(search.ranked_ids('собака'), [])
+
+    def test_prefix_and_ranking(self):
+        """Слова ищутся как префиксы, все сразу; частые совпадения выше."""
+        rare = self.create_post('Котики и собаки, а еще ёжики')
+        often = self.create_post('Кот, кот и еще раз кот с собакой')
+        self.create_post('Только собаки')
+        self.assertEqual(search.ranked_ids('кот соба'), [often.pk, rare.pk])
+        self.assertEqual(search.ranked_ids('ежик'), [rare.pk])
+        self.assertEqual(search.ranked_ids('"*) OR'), [])
+        self.assertEqual(search.ranked_ids('  '), [])
+
+    def test_search_page(self):
+        """Страница поиска листается номерами, сохраняя запрос."""
+        for number in range(NUMBER_OF_POSTS + 1):
+            self.create_post(f'Заметка про кота номер {number}')
+        self.create_post('Про погоду')
+        url = reverse('posts:search')
+        # Поиск по индексу и посты страницы с авторами и группами
+        response = self.assertQueryBudget(
+            self.guest_client, url, 2, data={'q': 'кот'}
+        )
+        self.assertEqual(len(response.context['page_obj']), NUMBER_OF_POSTS)
+        self.assertContains(
+            response, 'href="?q=%D0%BA%D0%BE%D1%82&amp;page=2"'
+        )
+        response = self.guest_client.get(url, {'q': 'кот', 'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 1)
+        response = self.guest_client.get(url, {'q': 'слон'})
+        self.assertContains(response, 'Ничего не найдено')
+        self.assertNotContains(self.guest_client.get(url), 'Ничего не найдено')
+
+    def test_admin_search(self):
+        """Поиск в админке идет по индексу и находит все совпадения."""
+        posts = [self.create_post('Рыжий кот'), self.create_post('Рыжик')]
+        self.create_post('Белая собака')
+        client = Client()
+        client.force_login(self.admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'рыж'}
+        )
+        self.assertEqual(
+            set(response.context['cl'].result_list), set(posts)
+        )
+        self.assertEqual(response.context['cl'].result_count, 2)
@@ -0,0 +1,162 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from sorl.thumbnail.models import KVStore
+
+from .. import storage, thumbnails
+from ..models import MediaBlob, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(name, SMALL_GIF, 'image/gif'),
+        )
+
+    def test_same_content_stored_once(self):
+        """Одинаковые картинки хранятся одним файлом с двумя ссылками."""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        folder = os.path.dirname(first.image.path)
+        self.assertEqual(os.listdir(folder), [
+            os.path.basename(first.image.name)
+        ])
+        self.assertEqual(MediaBlob.objects.get(name=first.image.name).refs, 2)
+
+    def test_last_reference_deletes_file(self):
+        """Файл удаляется, когда на него не ссылается ни один пост."""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        name, path = first.image.name, first.image.path
+        first.delete()
+        self.assertEqual(MediaBlob.objects.get(name=name).refs, 1)
+        storage.delete_file(name)
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+        storage.delete_file(name)
+        self.assertFalse(os.path.exists(path))
+
+    def test_replaced_image_released(self):
+        """Замена картинки переносит ссылку на новый файл."""
+        post = self.create_post('first.gif')
+        old_name = post.image.name
+        post = Post.objects.get(pk=post.pk)
+        post.image = SimpleUploadedFile('other.gif', SMALL_GIF + b'\x00')
+        post.save()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertFalse(MediaBlob.objects.filter(name=old_name).exists())
+        self.assertEqual(MediaBlob.objects.get(name=post.image.name).refs, 1)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class CollectMediaTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.live = self.create_post(SMALL_GIF)
+        self.deleted = self.create_post(SMALL_GIF + b'\x00')
+        for post in (self.live, self.deleted):
+            thumbnails.generate(post.pk)
+        self.deleted_path = self.deleted.image.path
+        # Удаление файла откладывается до фиксации транзакции,
+        # которой в TestCase не бывает: файл и миниатюры остаются
+        self.deleted.delete()
+        self.stray = os.path.join(TEMP_MEDIA_ROOT, 'cache', 'ab', 'x.jpg')
+        os.makedirs(os.path.dirname(self.stray))
+        with open(self.stray, 'wb') as stray:
+            stray.write(SMALL_GIF)
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, content):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('image.gif', content, 'image/gif'),
+        )
+
+    def collect(self, *args):
+        out = StringIO()
+        call_command('collect_media', *args, stdout=out)
+        return out.getvalue()
+
+    def media_files(self):
+        return sorted(
+            os.path.join(path, name)
+            for path, _, names in os.walk(TEMP_MEDIA_ROOT)
+            for name in names
+        )
+
+    def test_dry_run(self):
+        """Пробный запуск только считает."""
+        files = self.media_files()
+        output = self.collect('--dry-run', '--min-age=0')
+        self.assertEqual(self.media_files(), files)
+        self.assertIn('Миниатюры удаленных картинок: 1', output)
+        self.assertIn('Картинки без постов: 1', output)
+        self.assertIn('Файлы миниатюр без записей в KVStore: 1', output)
+
+    def test_collect(self):
+        """Удаляются файлы без постов, живые остаются."""
+        self.collect('--min-age=0', '--batch-size=2')
+        self.assertFalse(os.path.exists(self.deleted_path))
+        self.assertFalse(os.path.exists(self.stray))
+        self.assertTrue(os.path.exists(self.live.image.path))
+        self.assertEqual(
+            len(self.media_files()), 1 + len(thumbnails.VARIANTS)
+        )
+        self.assertEqual(
+            KVStore.objects.filter(key__contains='||thumbnails||').count(), 1
+        )
+        self.assertIn('Картинки без постов: 0', self.collect('--min-age=0'))
+
+    def test_fresh_files_kept(self):
+        """Свежие файлы могут принадлежать еще не сохраненному посту."""
+        self.collect()
+        self.assertTrue(os.path.exists(self.deleted_path))
+        self.assertTrue(os.path.exists(self.stray))
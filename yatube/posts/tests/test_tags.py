@@ -0,0 +1,103 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import tags
+from ..models import Mention, Post, PostTag
+from .utils import QueryBudgetMixin
+
+User = get_user_model()
+
+
+class TagsTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='ivan.petrov')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def create_post(self, text):
+        return Post.objects.create(author=self.author, text=text)
+
+    def post_tags(self, post):
+        return set(post.tag_entries.values_list('tag__name', flat=True))
+
+    def test_extract(self):
+        """Теги приводятся к нижнему регистру; почта, сущности HTML
+        и знаки после имени упоминанием не считаются.
+        """
+        self.assertEqual(
+            tags.extract(
+                '#Кот и #кот_2, @ivan.petrov. и a@b.ru, &#39; #'
+            ),
+            ({'кот', 'кот_2'}, {'ivan.petrov'}),
+        )
+
+    def test_index_follows_text(self):
+        """Теги и упоминания обновляются вместе с текстом поста."""
+        post = self.create_post('#Кот и @ivan.petrov, @nobody')
+        self.assertEqual(self.post_tags(post), {'кот'})
+        self.assertEqual(
+            list(post.mentions.values_list('user', flat=True)),
+            [self.reader.pk],
+        )
+        post.text = '#собака'
+        post.save()
+        self.assertEqual(self.post_tags(post), {'собака'})
+        self.assertFalse(post.mentions.exists())
+        post.delete()
+        self.assertFalse(PostTag.objects.exists())
+
+    def test_tag_feed(self):
+        """Лента тега — посты с ним, от новых к старым."""
+        first = self.create_post('Первый #кот')
+        self.create_post('Без тегов')
+        second = self.create_post('Второй #Кот и @ivan.petrov')
+        url = reverse('posts:tag_posts', args=['Кот'])
+        response = self.assertQueryBudget(self.guest_client, url, 2)
+        self.assertEqual(
+            list(response.context['page_obj']), [second, first]
+        )
+        response = self.guest_client.get(
+            reverse('posts:tag_posts', args=['нет'])
+        )
+        self.assertEqual(response.status_code, 404)
+        response = self.guest_client.get(
+            reverse('posts:mentions', args=[self.reader.username])
+        )
+        self.assertEqual(list(response.context['page_obj']), [second])
+
+    def test_links_in_text(self):
+        """Теги и упоминания в тексте поста — ссылки."""
+        post = self.create_post('Мой #Кот и @ivan.petrov <b>')
+        response = self.guest_client.get(
+            reverse('posts:post_detail', args=[post.pk])
+        )
+        self.assertContains(
+            response,
+            '<p>Мой <a href="{}">#Кот</a> и <a href="{}">@ivan.petrov</a>'
+            ' &lt;b&gt;</p>'.format(
+                reverse('posts:tag_posts', args=['кот']),
+                reverse('posts:profile', args=['ivan.petrov']),
+            ),
+            html=True,
+        )
+
+    def test_reindex(self):
+        """Команда раскладывает теги постов, сохраненных в обход
+        сигналов, пачками.
+        """
+        posts = [self.create_post(f'#тег{number} @ivan.petrov')
+                 for number in range(5)]
+        PostTag.objects.all().delete()
+        Mention.objects.all().delete()
+        call_command('reindex_tags', batch_size=2, stdout=StringIO())
+        for number, post in enumerate(posts):
+            self.assertEqual(self.post_tags(post), {f'тег{number}'})
+        self.assertEqual(Mention.objects.count(), 5)
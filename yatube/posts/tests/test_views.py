@@ -2,15 +2,24 @@
 # from email.mime import image
 import shutil
 import tempfile
+from io import StringIO
+from unittest import mock
 from django.contrib.auth import get_user_model
 from django .core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase, Client, override_settings
 from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management import call_command
 from django.urls import reverse
+from django.template.loader import render_to_string
 from django import forms
 from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from sorl.thumbnail import default
 
-from ..models import Follow, Group, Post
+from .. import thumbnails
+from ..models import Follow, Group, Post, TimelineEntry
 
 User = get_user_model()
 
@@ -21,7 +30,7 @@ POSTS_ON_SECOND_PAGE = 5
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostViewTest(TestCase):
     @classmethod
     def tearDownClass(cls):
@@ -57,6 +66,7 @@ class PostViewTest(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         # Создаем неавторизованный клиент
         self.guest_client = Client()
         # Создаем авторизованного клиента
@@ -223,7 +233,9 @@ class PostViewTest(TestCase):
 
     # Проверка кэширования главной страницы
     def test_cache_index_page(self):
-        """Тест кэширования главной страницы."""
+        """Главная страница читается из кэша, а запись
+        сразу его сбрасывает.
+        """
         cache.clear()
         post_2 = Post.objects.create(
             text='Тестируем кэш',
@@ -233,10 +245,274 @@ class PostViewTest(TestCase):
         first_content = first_response.content
         object_before_delete = first_response.context['page_obj'][0]
         self.assertEqual(object_before_delete.text, post_2.text)
+        with self.assertNumQueries(0):
+            second_response = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(first_content, second_response.content)
         post_2.delete()
-        second_response = self.guest_client.get(reverse('posts:index'))
-        second_content = second_response.content
-        self.assertEqual(first_content, second_content)
+        third_response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotIn(post_2, third_response.context['page_obj'])
+
+    def test_post_card_cache(self):
+        """Карточки постов кешируются, а правка поста
+        сбрасывает только его карточку.
+        """
+        other_post = Post.objects.create(text='Другой пост', author=self.user)
+        self.guest_client.get(reverse('posts:index'))
+        old_key = make_template_fragment_key(
+            'post_card', [self.post.card_version]
+        )
+        other_key = make_template_fragment_key(
+            'post_card', [other_post.card_version]
+        )
+        self.assertIsNotNone(cache.get(old_key))
+        self.assertIsNotNone(cache.get(other_key))
+
+        self.author_client.post(
+            reverse('posts:post_edit', args=(self.post.id,)),
+            data={'text': 'Исправленный пост', 'group': self.group.id},
+        )
+        self.assertIsNone(cache.get(old_key))
+        self.assertIsNotNone(cache.get(other_key))
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Исправленный пост')
+
+    def test_post_card_shows_renamed_author(self):
+        """Имя автора не хранится в кеше карточки: после
+        переименования оно видно без правки поста.
+        """
+        render_to_string('includes/post.html', {'post': self.post})
+        self.post.author.first_name = 'Переименованный'
+        html = render_to_string('includes/post.html', {'post': self.post})
+        self.assertIn('Переименованный', html)
+
+    def test_feed_caches_follow_writes(self):
+        """Кэш лент группы и профиля сбрасывается при
+        создании, переносе и удалении поста.
+        """
+        cache.clear()
+        other_group = Group.objects.create(
+            title='Другая группа', slug='other', description='Описание'
+        )
+        group_url = reverse('posts:group_list', args=(self.group.slug,))
+        other_url = reverse('posts:group_list', args=(other_group.slug,))
+        profile_url = reverse('posts:profile', args=(self.user.username,))
+        for url in (group_url, other_url, profile_url):
+            self.guest_client.get(url)
+
+        post = Post.objects.create(
+            text='Новый пост', author=self.user, group=self.group
+        )
+        for url in (group_url, profile_url):
+            with self.subTest(url=url):
+                page_obj = self.guest_client.get(url).context['page_obj']
+                self.assertIn(post, page_obj)
+
+        post.group = other_group
+        post.save()
+        self.assertNotIn(
+            post, self.guest_client.get(group_url).context['page_obj']
+        )
+        self.assertIn(
+            post, self.guest_client.get(other_url).context['page_obj']
+        )
+
+        post.delete()
+        self.assertNotIn(
+            post, self.guest_client.get(profile_url).context['page_obj']
+        )
+
+    def test_conditional_get(self):
+        """Неизмененная страница отдается как 304 без запросов к базе,
+        а запись меняет ETag.
+        """
+        index_url = reverse('posts:index')
+        response = self.guest_client.get(index_url)
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(
+                index_url, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(
+            self.author_client.get(index_url)['ETag'], etag
+        )
+        Post.objects.create(text='Свежий пост', author=self.user)
+        response = self.guest_client.get(index_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        detail_url = reverse('posts:post_detail', args=(self.post.id,))
+        etag = self.guest_client.get(detail_url)['ETag']
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=(self.post.id,)),
+            data={'text': 'Новый комментарий'},
+        )
+        response = self.guest_client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Новый комментарий')
+
+        reader = User.objects.create_user(username='reader')
+        profile_url = reverse('posts:profile', args=(self.user.username,))
+        etag = self.guest_client.get(profile_url)['ETag']
+        Follow.objects.create(user=reader, author=self.user)
+        response = self.guest_client.get(profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_conditional_get_after_new_login(self):
+        """После выхода и нового входа страница с формой отдается
+        заново с новым csrf-токеном, и комментарий с ним проходит.
+        """
+        User.objects.create_user(username='reader', password='password')
+        client = Client(enforce_csrf_checks=True)
+        login_url = reverse('users:login')
+        detail_url = reverse('posts:post_detail', args=(self.post.id,))
+
+        def login():
+            client.get(login_url)
+            client.post(login_url, {
+                'username': 'reader',
+                'password': 'password',
+                'csrfmiddlewaretoken': client.cookies['csrftoken'].value,
+            })
+
+        login()
+        etag = client.get(detail_url)['ETag']
+        client.get(reverse('users:logout'))
+        login()
+        response = client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        client.post(reverse('posts:add_comment', args=(self.post.id,)), {
+            'text': 'После нового входа',
+            'csrfmiddlewaretoken': response.context['csrf_token'],
+        })
+        self.assertTrue(
+            self.post.comments.filter(text='После нового входа').exists()
+        )
+
+    @override_settings(PAGE_CACHE_TIMEOUT=60)
+    def test_guest_page_cache(self):
+        """Гость получает страницу из кеша, пока ее не изменит запись;
+        пользователю с сессией кеш страниц не отдается.
+        """
+        detail_url = reverse('posts:post_detail', args=(self.post.id,))
+        response = self.guest_client.get(detail_url)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        with self.assertNumQueries(1):
+            response = self.guest_client.get(detail_url)
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertContains(response, self.post.text)
+
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=(self.post.id,)),
+            data={'text': 'Комментарий гостю'},
+        )
+        response = self.guest_client.get(detail_url)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Комментарий гостю')
+        response = self.authorized_client.get(detail_url)
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+        out = StringIO()
+        call_command('page_cache_stats', '--reset', stdout=out)
+        self.assertIn('Попаданий: 1', out.getvalue())
+        self.assertIn('Промахов: 2', out.getvalue())
+
+    def test_thumbnail_built_outside_render(self):
+        """Лента не строит миниатюры сама: до построения выводится
+        заглушка, после — варианты картинки из одного декодирования,
+        и кеш ленты сбрасывается.
+        """
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'aspect-ratio: 960 / 339')
+        self.assertNotContains(response, '<img class="card-img')
+
+        with mock.patch.object(
+            default.engine, 'get_image', wraps=default.engine.get_image
+        ) as get_image:
+            thumbnails.generate(self.post.id)
+        self.assertEqual(get_image.call_count, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.image_width, self.post.image_height), (960, 339)
+        )
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, '<img class="card-img')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, ' 480w, ')
+        self.assertContains(response, 'width="960" height="339"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertNotContains(response, 'aspect-ratio: 960 / 339')
+        # Картинка загружена в обход формы: заглушка строится вместе
+        # с вариантами и видна, пока грузится сам вариант
+        self.assertContains(response, 'background: url(data:image/jpeg')
+
+    def test_render_only_requests_thumbnails(self):
+        """Страница не строит миниатюры в своем потоке: без фоновых
+        потоков ничего не запускает, с ними только передает пост
+        в очередь, а пост с неудачным построением не передает.
+        """
+        url = reverse('posts:index')
+        with mock.patch.object(
+            thumbnails, '_submit'
+        ) as submit, mock.patch.object(
+            thumbnails, 'generate', side_effect=OSError
+        ) as generate:
+            self.guest_client.get(url)
+            submit.assert_not_called()
+            with override_settings(THUMBNAIL_WORKERS=1):
+                cache.clear()
+                self.guest_client.get(url)
+                submit.assert_called_once_with(self.post.pk)
+            with self.assertLogs(thumbnails.logger, 'ERROR'):
+                thumbnails._run(self.post.pk)
+            submit.reset_mock()
+            with override_settings(THUMBNAIL_WORKERS=1):
+                thumbnails.prefetch([self.post])
+                submit.assert_not_called()
+        generate.assert_called_once_with(self.post.pk)
+
+    def test_placeholder_before_thumbnails(self):
+        """Пока варианты строятся, выводится встроенная заглушка."""
+        Post.objects.filter(pk=self.post.pk).update(
+            image_placeholder='data:image/jpeg;base64,AAAA'
+        )
+        cache.clear()
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(
+            response,
+            '<img class="card-img my-2" src="data:image/jpeg;base64,AAAA"',
+        )
+        self.assertNotContains(response, 'aspect-ratio: 960 / 339')
+
+    def test_thumbnails_prefetched_per_page(self):
+        """Адреса картинок всей страницы ищутся одним запросом
+        и кешируются вместе со страницей ленты.
+        """
+        for number in range(3):
+            post = Post.objects.create(
+                text=f'Пост {number}', author=self.user,
+                image=self.post.image.name,
+            )
+            thumbnails.generate(post.id)
+        thumbnails.generate(self.post.id)
+        cache.clear()
+        posts = list(Post.objects.all())
+        with self.assertNumQueries(1):
+            thumbnails.prefetch(posts)
+        self.assertTrue(all(post.image_sources for post in posts))
+
+        cache.clear()
+        self.guest_client.get(reverse('posts:index'))
+        page_obj = self.author_client.get(
+            reverse('posts:index')
+        ).context['page_obj']
+        self.assertTrue(all(post.image_sources for post in page_obj))
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0)
+    def test_guest_page_cache_disabled(self):
+        """Нулевой срок жизни выключает кеш страниц."""
+        self.guest_client.get(reverse('posts:index'))
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('X-Page-Cache'))
 
 
 class PaginatorViewTest(TestCase):
@@ -262,6 +538,7 @@ class PaginatorViewTest(TestCase):
             )
 
     def setUp(self):
+        cache.clear()
         # Создаем неавторизованный клиент
         self.guest_client = Client()
         # Создаем авторизованый клиент
@@ -286,6 +563,60 @@ class PaginatorViewTest(TestCase):
             self.assertEqual(posts_on_first_page, POSTS_ON_FIRST_PAGE)
             self.assertEqual(posts_on_second_page, POSTS_ON_SECOND_PAGE)
 
+    # Проверяем курсорный паджинатор
+    def test_cursor_paginator(self):
+        """Лента листается курсором вперед и назад без COUNT(*)."""
+        pages_names = {
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.post.author,)),
+        }
+        for page in pages_names:
+            with self.subTest(page=page):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    first_page = self.guest_client.get(page).context[
+                        'page_obj'
+                    ]
+                self.assertFalse(any(
+                    'COUNT(' in query['sql'] or 'OFFSET' in query['sql']
+                    for query in queries
+                ))
+                self.assertEqual(len(first_page), POSTS_ON_FIRST_PAGE)
+                self.assertFalse(first_page.has_previous())
+                self.assertTrue(first_page.has_next())
+
+                cache.clear()
+                second_page = self.guest_client.get(
+                    page, {'cursor': first_page.paginator.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(len(second_page), POSTS_ON_SECOND_PAGE)
+                self.assertFalse(second_page.has_next())
+                self.assertTrue(second_page.has_previous())
+                self.assertEqual(
+                    set(first_page) & set(second_page), set()
+                )
+                self.assertEqual(
+                    list(first_page) + list(second_page),
+                    list(Post.objects.order_by('-pub_date', '-id')),
+                )
+
+                cache.clear()
+                previous_page = self.guest_client.get(
+                    page, {'cursor': second_page.paginator.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(previous_page), list(first_page))
+                self.assertFalse(previous_page.has_previous())
+
+    def test_broken_cursor_shows_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': 'not-a-cursor'}
+        )
+        self.assertEqual(
+            len(response.context['page_obj']), POSTS_ON_FIRST_PAGE
+        )
+
 
 class FollowViewTest(TestCase):
     @classmethod
@@ -296,6 +627,7 @@ class FollowViewTest(TestCase):
         cls.user_not_follower = User.objects.create_user(username='somebody')
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client_follower = Client()
         self.authorized_client_follower.force_login(self.user_follower)
@@ -347,3 +679,113 @@ class FollowViewTest(TestCase):
         )
         new_posts = response_after_post.context['page_obj']
         self.assertIn(post, new_posts)
+
+    def test_follow_feed_shows_edited_post(self):
+        """Правка поста сразу видна в закешированной ленте подписчика."""
+        Follow.objects.create(user=self.user_follower, author=self.author)
+        post = Post.objects.create(author=self.author, text='Старый текст')
+        url = reverse('posts:follow_index')
+        self.assertContains(
+            self.authorized_client_follower.get(url), 'Старый текст'
+        )
+        post.text = 'Новый текст'
+        post.save()
+        response = self.authorized_client_follower.get(url)
+        self.assertContains(response, 'Новый текст')
+        self.assertNotContains(response, 'Старый текст')
+
+    # Проверка материализованной ленты подписок
+    def test_timeline_follows_subscriptions(self):
+        """Лента подписок заполняется при подписке и публикации
+        и очищается при отписке.
+        """
+        old_post = Post.objects.create(author=self.author, text='Старый')
+        Follow.objects.create(user=self.user_follower, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(
+                user=self.user_follower
+            ).values_list('post', flat=True).order_by('-post_id')),
+            [new_post.id, old_post.id],
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user_not_follower)
+        )
+        self.authorized_client_follower.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,))
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user_follower)
+        )
+
+    @override_settings(TIMELINE_LENGTH=3)
+    def test_timeline_is_trimmed(self):
+        """Лента подписок хранит не больше TIMELINE_LENGTH постов."""
+        Follow.objects.create(user=self.user_follower, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(5)
+        ]
+        response = self.authorized_client_follower.get(
+            reverse('posts:follow_index')
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), posts[:-4:-1]
+        )
+
+    @override_settings(TIMELINE_LENGTH=2)
+    def test_fan_out_queries_do_not_grow_with_followers(self):
+        """Новый пост раскладывается и обрезает ленты за одно и то же
+        число запросов при любом числе подписчиков.
+        """
+        def publish():
+            with CaptureQueriesContext(connection) as queries:
+                Post.objects.create(author=self.author, text='Пост')
+            return len(queries.captured_queries)
+
+        Follow.objects.create(user=self.user_follower, author=self.author)
+        publish()
+        publish()
+        expected = publish()
+        for number in range(3):
+            user = User.objects.create_user(username=f'follower{number}')
+            Follow.objects.create(user=user, author=self.author)
+        self.assertEqual(publish(), expected)
+        for follow in Follow.objects.all():
+            with self.subTest(user=follow.user_id):
+                self.assertEqual(TimelineEntry.objects.filter(
+                    user_id=follow.user_id
+                ).count(), 2)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'test_cache_table',
+    }})
+    def test_post_writes_with_db_cache_do_not_grow_with_followers(self):
+        """С кешем в базе, как в продакшене, создание, правка
+        и удаление поста стоят одно и то же число запросов при любом
+        числе подписчиков: ленты подписок устаревают одним UPDATE.
+        """
+        call_command('createcachetable')
+
+        def write():
+            counts = []
+            with CaptureQueriesContext(connection) as queries:
+                post = Post.objects.create(author=self.author, text='Пост')
+            counts.append(len(queries.captured_queries))
+            with CaptureQueriesContext(connection) as queries:
+                post.text = 'Исправленный пост'
+                post.save()
+            counts.append(len(queries.captured_queries))
+            with CaptureQueriesContext(connection) as queries:
+                post.delete()
+            counts.append(len(queries.captured_queries))
+            return counts
+
+        Follow.objects.create(user=self.user_follower, author=self.author)
+        write()
+        expected = write()
+        for number in range(5):
+            user = User.objects.create_user(username=f'follower{number}')
+            Follow.objects.create(user=user, author=self.author)
+        self.assertEqual(write(), expected)
@@ -0,0 +1,19 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """Проверки числа SQL-запросов для TestCase."""
+
+    def assertQueryBudget(self, client, url, budget, **kwargs):
+        """Запрашивает url и падает, если запросов больше budget."""
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, **kwargs)
+        executed = [query['sql'] for query in queries.captured_queries]
+        self.assertLessEqual(
+            len(executed),
+            budget,
+            f'{url}: {len(executed)} запросов при бюджете {budget}:\n'
+            + '\n'.join(executed),
+        )
+        return response
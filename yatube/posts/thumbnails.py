@@ -0,0 +1,295 @@
+"""Миниатюры картинок постов строятся в фоне.
+
+Бэкенд sorl-thumbnail (settings.THUMBNAIL_BACKEND) при рендеринге
+шаблона только ищет готовую миниатюру в KVStore. Если ее нет, он
+передает построение фоновым потокам и возвращает None, а шаблон
+выводит заглушку. Сам рендеринг картинки не декодирует никогда,
+а неудачное построение не повторяется до FAILED_TIMEOUT.
+
+Картинка поста выводится в нескольких ширинах в WebP и в JPEG для
+браузеров без WebP; все варианты строятся из одного декодирования
+исходного файла.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDbKVStore
+)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import uploads
+
+logger = logging.getLogger(__name__)
+
+# Ширины вариантов картинки; пропорции карточки 960x339
+WIDTHS = (480, 720, 960)
+FORMATS = ('WEBP', 'JPEG')
+QUALITY = 80
+# Столько секунд страницы не просят заново построить миниатюры поста,
+# на котором построение упало
+FAILED_TIMEOUT = 60 * 60
+
+
+def _geometry(width):
+    return f'{width}x{round(width * 339 / 960)}'
+
+
+# (формат, ширина) -> геометрия и параметры sorl-thumbnail
+VARIANTS = {
+    (image_format, width): (_geometry(width), {
+        'crop': 'center',
+        'upscale': True,
+        'format': image_format,
+        'quality': QUALITY,
+    })
+    for image_format in FORMATS
+    for width in WIDTHS
+}
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+    """Не строит миниатюры во время рендеринга страниц."""
+
+    def _options(self, source, options):
+        # Те же параметры по умолчанию, что в ThumbnailBackend.get_thumbnail
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def _thumbnail_file(self, source, geometry_string, options):
+        name = self._get_thumbnail_filename(
+            source, geometry_string, self._options(source, options)
+        )
+        return ImageFile(name, default.storage)
+
+    def lookup(self, file_, geometry_string, **options):
+        """Миниатюра из KVStore или None, если ее еще не построили."""
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        return default.kvstore.get(
+            self._thumbnail_file(ImageFile(file_), geometry_string, options)
+        )
+
+    def lookup_many(self, requests):
+        """Миниатюры для [(файл, геометрия, параметры), ...] одним
+        get_many из кеша и одним запросом к базе для промахов.
+        """
+        thumbnails = [
+            self._thumbnail_file(ImageFile(file_), geometry, dict(options))
+            for file_, geometry, options in requests
+        ]
+        kvstore = default.kvstore
+        if not isinstance(kvstore, CachedDbKVStore):
+            return [kvstore.get(thumbnail) for thumbnail in thumbnails]
+        keys = [add_prefix(thumbnail.key) for thumbnail in thumbnails]
+        found = kvstore.cache.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            stored = dict(KVStoreModel.objects.filter(
+                key__in=missing
+            ).values_list('key', 'value'))
+            # Как и KVStore, запоминаем отсутствие значения в кеше
+            fetched = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+            kvstore.cache.set_many(
+                fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+            found.update(fetched)
+        return [
+            None if found[key] == EMPTY_VALUE
+            else deserialize_image_file(found[key])
+            for key in keys
+        ]
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        """Готовая миниатюра или None, если она еще строится."""
+        thumbnail = self.lookup(file_, geometry_string, **options)
+        if thumbnail is None:
+            post = getattr(file_, 'instance', None)
+            if post is not None:
+                request([post])
+        return thumbnail
+
+    def generate(self, file_, variants):
+        """Строит миниатюры [(геометрия, параметры), ...] из одного
+        декодирования исходной картинки.
+
+        Уже записанные в хранилище файлы, как и в sorl-thumbnail, только
+        регистрируются в KVStore: хранилище не перезаписывает файлы.
+        """
+        source = ImageFile(file_)
+        source_image = None
+        thumbnails = []
+        try:
+            for geometry_string, options in variants:
+                options = self._options(source, dict(options))
+                thumbnail = self._thumbnail_file(
+                    source, geometry_string, options
+                )
+                if (
+                    sorl_settings.THUMBNAIL_FORCE_OVERWRITE
+                    or not thumbnail.exists()
+                ):
+                    if source_image is None:
+                        source_image = default.engine.get_image(source)
+                        source.set_size(
+                            default.engine.get_image_size(source_image)
+                        )
+                    self._create_thumbnail(
+                        source_image, geometry_string, options, thumbnail
+                    )
+                default.kvstore.get_or_set(source)
+                default.kvstore.set(thumbnail, source)
+                thumbnails.append(thumbnail)
+        finally:
+            if source_image is not None:
+                default.engine.cleanup(source_image)
+        return thumbnails
+
+
+def prefetch(posts):
+    """Находит варианты картинок всех постов страницы разом.
+
+    Каждому посту с картинкой достается image_sources: адреса
+    вариантов {(формат, ширина): url} или None, если варианты еще
+    строятся. Это строки, поэтому они кешируются вместе с постами
+    страницы ленты.
+    """
+    posts = [post for post in posts if post.image]
+    found = iter(default.backend.lookup_many([
+        (post.image, geometry, options)
+        for post in posts
+        for geometry, options in VARIANTS.values()
+    ]))
+    missing = []
+    for post in posts:
+        sources = {key: next(found) for key in VARIANTS}
+        if None in sources.values():
+            post.image_sources = None
+            missing.append(post)
+        else:
+            post.image_sources = {
+                key: thumbnail.url for key, thumbnail in sources.items()
+            }
+    request(missing)
+    return posts
+
+
+def sources(post):
+    """Адреса вариантов картинки поста или None, пока они строятся."""
+    if not hasattr(post, 'image_sources'):
+        prefetch([post])
+    return post.image_sources
+
+
+def generate(post_id):
+    """Строит все миниатюры поста, а если картинка попала в пост
+    в обход формы, то и заглушку из наименьшего варианта.
+
+    Сохранение поста меняет его версию и поколения лент, поэтому
+    карточки с заглушкой перестают читаться из кеша.
+    """
+    from .models import Post
+
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    missing = [
+        (geometry, options) for geometry, options in VARIANTS.values()
+        if default.backend.lookup(post.image, geometry, **options) is None
+    ]
+    if not missing and post.image_placeholder:
+        return
+    if missing:
+        default.backend.generate(post.image, missing)
+    geometry, options = VARIANTS['JPEG', max(WIDTHS)]
+    largest = default.backend.lookup(post.image, geometry, **options)
+    post.image_width, post.image_height = largest.width, largest.height
+    if not post.image_placeholder:
+        geometry, options = VARIANTS['JPEG', min(WIDTHS)]
+        smallest = default.backend.lookup(post.image, geometry, **options)
+        with smallest.storage.open(smallest.name) as file_:
+            with Image.open(file_) as image:
+                post.image_placeholder = uploads.placeholder(image)
+    post.save(update_fields=[
+        'updated', 'image_width', 'image_height', 'image_placeholder'
+    ])
+
+
+def _failed_key(post_id):
+    return f'thumbnails:failed:{post_id}'
+
+
+def _run(post_id):
+    try:
+        generate(post_id)
+    except Exception:
+        logger.exception('Миниатюры поста %s не построены', post_id)
+        cache.set(_failed_key(post_id), True, FAILED_TIMEOUT)
+    finally:
+        with _lock:
+            _pending.discard(post_id)
+        if settings.THUMBNAIL_WORKERS:
+            connection.close()
+
+
+def _submit(post_id):
+    global _executor
+    with _lock:
+        if post_id in _pending:
+            return
+        _pending.add(post_id)
+        if settings.THUMBNAIL_WORKERS and _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    if settings.THUMBNAIL_WORKERS:
+        _executor.submit(_run, post_id)
+    else:
+        _run(post_id)
+
+
+def queue(post):
+    """Ставит построение миниатюр сохраненного поста в очередь после
+    фиксации транзакции, чтобы поток видел сохраненный пост. Новая
+    картинка строится, даже если прежняя не удалась.
+    """
+    if post.pk and post.image:
+        cache.delete(_failed_key(post.pk))
+        transaction.on_commit(lambda: _submit(post.pk))
+
+
+def request(posts):
+    """Просьба страницы построить миниатюры постов: только передает
+    их фоновым потокам. Без потоков (THUMBNAIL_WORKERS = 0) и для
+    постов, на которых построение недавно упало, ничего не делает.
+    """
+    if not settings.THUMBNAIL_WORKERS:
+        return
+    posts = [post for post in posts if post.pk and post.image]
+    failed = cache.get_many([_failed_key(post.pk) for post in posts])
+    for post in posts:
+        if _failed_key(post.pk) not in failed:
+            _submit(post.pk)
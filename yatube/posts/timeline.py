@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.db.models import F, OuterRef, Subquery
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+BATCH_SIZE = 500
+
+
+def _timeline_length():
+    return settings.TIMELINE_LENGTH
+
+
+def trim(user_id):
+    """Оставляет в ленте пользователя не больше TIMELINE_LENGTH записей."""
+    boundary = (
+        TimelineEntry.objects
+        .filter(user_id=user_id)
+        .order_by('-pub_date', '-post_id')
+        .values_list('pub_date', 'post_id')[_timeline_length():][:1]
+    )
+    for pub_date, post_id in boundary:
+        TimelineEntry.objects.filter(user_id=user_id).filter(
+            pub_date__lte=pub_date
+        ).exclude(pub_date=pub_date, post_id__gt=post_id).delete()
+
+
+def touch_followers(author_ids):
+    """Сдвигает версию лент подписок всех подписчиков авторов
+    одним запросом: их закешированные страницы устаревают.
+    """
+    UserStats.objects.filter(user_id__in=Follow.objects.filter(
+        author_id__in=author_ids
+    ).values('user_id')).update(feed_version=F('feed_version') + 1)
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора,
+    сдвигает версию их лент и возвращает id этих подписчиков.
+    """
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    entries = [
+        TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    ]
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+    # До поста в каждой ленте было не больше TIMELINE_LENGTH записей,
+    # значит, лишней может стать только запись на этой позиции.
+    # Все такие записи удаляются одним запросом, а не по подписчику.
+    excess = TimelineEntry.objects.filter(
+        user_id=OuterRef('user_id')
+    ).order_by('-pub_date', '-post_id').values('pk')[
+        _timeline_length():_timeline_length() + 1
+    ]
+    TimelineEntry.objects.filter(pk__in=Follow.objects.filter(
+        author_id=post.author_id
+    ).annotate(excess=Subquery(excess)).values('excess')).delete()
+    touch_followers([post.author_id])
+    return [entry.user_id for entry in entries]
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика последние посты автора."""
+    posts = (
+        Post.objects
+        .filter(author_id=author_id)
+        .order_by('-pub_date', '-id')
+        .values_list('id', 'pub_date')[:_timeline_length()]
+    )
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=date)
+            for post_id, date in posts
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    trim(user_id)
+
+
+def purge(user_id, author_id):
+    """Убирает из ленты бывшего подписчика посты автора."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
@@ -0,0 +1,94 @@
+"""Проверка и нормализация загруженных картинок.
+
+Размер в байтах и число пикселей проверяются по заголовку файла до
+декодирования, поэтому «бомба» из маленького файла с огромной
+картинкой не попадает в память. JPEG декодируется сразу в уменьшенном
+масштабе, картинка пересохраняется без EXIF, а результат пишется во
+временный файл, который уходит на диск, если он больше
+FILE_UPLOAD_MAX_MEMORY_SIZE.
+
+Из того же декодирования получается заглушка: крошечная размытая
+копия в кадре карточки, которая встраивается в страницу как data URI.
+"""
+import base64
+import math
+import os
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageFilter, ImageOps
+
+# Форматы, которые сохраняются как есть; остальные переводятся в JPEG
+EXTENSIONS = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+    'GIF': '.gif',
+    'WEBP': '.webp',
+}
+JPEG_QUALITY = 90
+# Кадр карточки 960x339 в 30 раз меньше
+PLACEHOLDER_SIZE = (32, 11)
+PLACEHOLDER_QUALITY = 40
+
+
+def placeholder(image):
+    """Размытая копия картинки размером PLACEHOLDER_SIZE как data URI."""
+    small = ImageOps.fit(image, PLACEHOLDER_SIZE, Image.BICUBIC)
+    small = small.convert('RGB').filter(ImageFilter.GaussianBlur(1))
+    output = BytesIO()
+    small.save(output, 'JPEG', quality=PLACEHOLDER_QUALITY, optimize=True)
+    return 'data:image/jpeg;base64,' + base64.b64encode(
+        output.getvalue()
+    ).decode()
+
+
+def normalize(upload):
+    """Проверенная и уменьшенная копия загруженной картинки без EXIF."""
+    if upload.size > settings.MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s',
+            code='file_too_large',
+            params={'limit': filesizeformat(settings.MAX_UPLOAD_SIZE)},
+        )
+    upload.seek(0)
+    with Image.open(upload) as image:
+        width, height = image.size
+        if width * height > settings.MAX_IMAGE_PIXELS:
+            raise ValidationError(
+                'Картинка %(width)s×%(height)s слишком большая',
+                code='too_many_pixels',
+                params={'width': width, 'height': height},
+            )
+        image_format = image.format if image.format in EXTENSIONS else 'JPEG'
+        side = settings.MAX_IMAGE_SIDE
+        ratio = min(side / width, side / height, 1)
+        # JPEG декодируется в наименьшем масштабе, не меньшем итогового
+        image.draft('RGB', (
+            math.ceil(width * ratio), math.ceil(height * ratio)
+        ))
+        image = ImageOps.exif_transpose(image)
+    image.thumbnail((side, side))
+    options = {}
+    if image_format == 'JPEG':
+        options.update(quality=JPEG_QUALITY, optimize=True)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+    output = SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    # EXIF и прочие метаданные не передаются и не сохраняются
+    image.save(output, image_format, **options)
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    normalized = UploadedFile(
+        file=output,
+        name=name + EXTENSIONS[image_format],
+        content_type=Image.MIME[image_format],
+        size=output.tell(),
+    )
+    # Сохраняется вместе с постом (signals.set_image_placeholder)
+    normalized.placeholder = placeholder(image)
+    return normalized
@@ -15,6 +15,14 @@ urlpatterns = [
         'posts/<int:post_id>/comment/', views.add_comment, name='add_comment'
     ),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search_posts, name='search'),
+    path('export/', views.export, name='export'),
+    path('tags/<str:name>/', views.tag_posts, name='tag_posts'),
+    path(
+        'profile/<str:username>/mentions/',
+        views.mentions,
+        name='mentions'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -1,10 +1,179 @@
+import base64
+import binascii
+import json
+
 from django.core.paginator import Paginator
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+CURSOR_PARAM = 'cursor'
+PAGE_PARAM = 'page'
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+# До стольких строк COUNT(*) дешев, и число считается точно
+ESTIMATE_THRESHOLD = 10000
+
+
+def encode_cursor(direction, obj, keys):
+    """Упаковывает направление и ключ (дата, id) объекта
+    в непрозрачный токен для URL.
+    """
+    date_key, id_key = keys
+    payload = [
+        direction,
+        getattr(obj, date_key).isoformat(),
+        getattr(obj, id_key),
+    ]
+    data = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен; для испорченного токена возвращает None."""
+    if not token:
+        return None
+    try:
+        data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, date, pk = json.loads(data.decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        return None
+    date = parse_datetime(date) if isinstance(date, str) else None
+    if direction not in (NEXT, PREVIOUS) or date is None:
+        return None
+    if not isinstance(pk, int):
+        return None
+    return direction, date, pk
+
+
+class CursorPaginator(Paginator):
+    """Паджинатор по ключу (pub_date, id).
+
+    Вместо COUNT(*) и OFFSET строит выборку от границы предыдущей
+    страницы, поэтому любая страница стоит одинаково. Страница
+    остается обычным объектом Page, а токены соседних страниц
+    хранятся в next_cursor и previous_cursor.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id')):
+        super().__init__(object_list, per_page)
+        self.keys = keys
+        self.next_cursor = None
+        self.previous_cursor = None
+        self._num_pages = 1
+
+    @property
+    def num_pages(self):
+        # Общее число страниц неизвестно и не считается;
+        # его хватает, чтобы Page.has_next() и has_previous() работали.
+        return self._num_pages
+
+    def _ordered(self, descending=True):
+        prefix = '-' if descending else ''
+        return self.object_list.order_by(
+            *(prefix + key for key in self.keys)
+        )
+
+    def _after(self, date, pk, lookup):
+        # Внешнее условие по дате дает индексу диапазон, поэтому
+        # глубокая страница начинается с поиска, а не с обхода индекса.
+        date_key, id_key = self.keys
+        return Q(**{f'{date_key}__{lookup}e': date}) & (
+            Q(**{f'{date_key}__{lookup}': date})
+            | Q(**{f'{id_key}__{lookup}': pk})
+        )
+
+    def get_page(self, cursor):
+        return self.page(cursor)
+
+    def page_queryset(self, cursor=None):
+        """Запрос, которым выбирается страница: на одну запись больше
+        per_page, чтобы узнать, есть ли следующая.
+        """
+        decoded = decode_cursor(cursor)
+        if decoded is None:
+            queryset = self._ordered()
+        else:
+            direction, date, pk = decoded
+            if direction == NEXT:
+                queryset = self._ordered().filter(
+                    self._after(date, pk, 'lt')
+                )
+            else:
+                queryset = self._ordered(descending=False).filter(
+                    self._after(date, pk, 'gt')
+                )
+        return queryset[:self.per_page + 1]
+
+    def page(self, cursor=None):
+        decoded = decode_cursor(cursor)
+        direction = NEXT if decoded is None else decoded[0]
+        rows = list(self.page_queryset(cursor))
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == NEXT:
+            has_next, has_previous = has_more, decoded is not None
+        else:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        if not rows and decoded is not None:
+            # Граница устарела (например, посты удалены) —
+            # показываем первую страницу.
+            return self.page()
+        self.next_cursor = (
+            encode_cursor(NEXT, rows[-1], self.keys) if has_next else None
+        )
+        self.previous_cursor = (
+            encode_cursor(PREVIOUS, rows[0], self.keys)
+            if has_previous else None
+        )
+        number = 2 if has_previous else 1
+        self._num_pages = number + 1 if has_next else number
+        return self._get_page(rows, number, self)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Паджинатор списков админки без COUNT(*) по всей таблице.
+
+    Число строк таблицы без фильтров оценивается наибольшим id: это
+    один шаг по первичному ключу, а удаленные строки лишь дают пустые
+    последние страницы. Отфильтрованный список считается точно.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = queryset.model._base_manager.aggregate(
+                estimate=Max('pk')
+            )['estimate'] or 0
+            if estimate > ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
 
+def paginator(
+    request, posts, NUMBER_OF_POSTS, keys=('pub_date', 'id'), count=None
+):
+    """Возвращает контекст со страницей постов.
 
-def paginator(request, posts, NUMBER_OF_POSTS):
-    paginator = Paginator(posts, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    По умолчанию лента листается курсором (?cursor=...) по полям keys,
+    а номерные страницы (?page=N) оставлены как запасной режим.
+    Известное заранее число постов count избавляет его от COUNT(*).
+    """
+    if PAGE_PARAM in request.GET:
+        paginator = Paginator(
+            posts.order_by(*('-' + key for key in keys)), NUMBER_OF_POSTS
+        )
+        if count is not None:
+            paginator.count = count
+        page_obj = paginator.get_page(request.GET.get(PAGE_PARAM))
+    else:
+        paginator = CursorPaginator(posts, NUMBER_OF_POSTS, keys)
+        page_obj = paginator.get_page(request.GET.get(CURSOR_PARAM))
     context = {
         'page_obj': page_obj,
     }
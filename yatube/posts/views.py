@@ -1,68 +1,115 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
 from django.shortcuts import redirect
+from django.utils.http import urlencode
 
-from .models import Follow, Group, Post, User
+from . import (
+    cache, conditional, counters, exporter, importer, search, thumbnails
+)
+from .models import Follow, Group, Post, Tag, TimelineEntry, User
 from .forms import PostForm, CommentForm
 from .utils import paginator
 
 NUMBER_OF_POSTS: int = 10
 
 
+def _feed(request, posts, **kwargs):
+    """Страница ленты с адресами картинок всех ее постов."""
+    context = paginator(request, posts, NUMBER_OF_POSTS, **kwargs)
+    thumbnails.prefetch(context['page_obj'].object_list)
+    return context
+
+
+def _entry_feed(request, entries):
+    """Страница ленты из записей с датой и id поста (TimelineEntry,
+    PostTag, Mention): записи листаются по своему индексу, а на
+    страницу попадают их посты.
+    """
+    context = paginator(
+        request,
+        entries.select_related('post__author', 'post__group'),
+        NUMBER_OF_POSTS,
+        keys=('pub_date', 'post_id'),
+    )
+    page_obj = context['page_obj']
+    page_obj.object_list = [entry.post for entry in page_obj.object_list]
+    thumbnails.prefetch(page_obj.object_list)
+    return context
+
+
+@conditional.conditional_view(conditional.index_etag)
 def index(request):
     """Главная страница сайта."""
-    posts = Post.objects.all()
-    page_obj = paginator(request, posts, NUMBER_OF_POSTS)
+    posts = Post.objects.with_related()
     template = 'posts/index.html'
     context = {
         'posts': posts,
-        'page_obj': page_obj,
     }
-    context.update(paginator(request, posts, NUMBER_OF_POSTS))
+    context.update(cache.feed_page(
+        request,
+        cache.INDEX,
+        lambda: _feed(request, posts),
+    ))
     return render(request, template, context)
 
 
+@conditional.conditional_view(conditional.group_etag)
 def group_posts(request, slug):
     """Страница с постами, отфильтрованными по группам;
     view-функция принимает параметр slug из path().
     """
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    post_list = group.posts.with_related()
     template = 'posts/group_list.html'
-    page_obj = paginator(request, post_list, NUMBER_OF_POSTS)
     context = {
         'group': group,
-        'page_obj': page_obj,
     }
-    context.update(paginator(request, post_list, NUMBER_OF_POSTS))
+    context.update(cache.feed_page(
+        request,
+        cache.group_namespace(slug),
+        lambda: _feed(request, post_list),
+    ))
     return render(request, template, context)
 
 
+@conditional.conditional_view(conditional.profile_etag)
 def profile(request, username):
     """Страница профиля пользователя."""
-    author = get_object_or_404(User, username=username)
-    profile_list = author.posts.all()
-    all_posts = profile_list.count()
-    following = Follow.objects.filter(
-        author=author, user=request.user.id
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    profile_list = author.posts.with_related()
+    all_posts = counters.user_stats(author).posts_count
+    following = request.user.is_authenticated and Follow.objects.filter(
+        author=author, user=request.user
     ).exists()
-    page_obj = paginator(request, profile_list, NUMBER_OF_POSTS)
     context = {
-        'page_obj': page_obj,
         'all_posts': all_posts,
         'author': author,
         'following': following,
     }
-    context.update(paginator(request, profile_list, NUMBER_OF_POSTS))
+    context.update(cache.feed_page(
+        request,
+        cache.profile_namespace(username),
+        lambda: _feed(request, profile_list, count=all_posts),
+    ))
     return render(request, 'posts/profile.html', context)
 
 
+@conditional.conditional_view(conditional.post_etag)
 def post_detail(request, post_id):
     """Страница отдельного поста."""
-    post = get_object_or_404(Post, pk=post_id)
-    all_posts = post.author.posts.all().count()
+    post = get_object_or_404(
+        Post.objects.with_related().select_related('author__stats'),
+        pk=post_id
+    )
+    all_posts = counters.user_stats(post.author).posts_count
     form = CommentForm()
-    comments = post.comments.all()
+    comments = post.comments.select_related('author')
     context = {
         'post': post,
         'all_posts': all_posts,
@@ -82,8 +129,10 @@ def post_create(request):
             files=request.FILES or None
         )
         if form.is_valid():
-            form.save(commit=False).author = request.user
-            form.save()
+            # Счетчики и ленты подписчиков обновляются вместе с постом
+            with transaction.atomic():
+                form.save(commit=False).author = request.user
+                thumbnails.queue(form.save())
             user = request.user
             return redirect('posts:profile', user)
         return render(request, template, {'form': form})
@@ -103,12 +152,14 @@ def post_edit(request, post_id):
         instance=post
     )
 
-    if request.user != post.author:
+    if request.user.id != post.author_id:
         return redirect('posts:post_detail', post_id)
 
     elif request.method == 'POST':
+        card_version = post.card_version
         if form.is_valid():
-            form.save()
+            thumbnails.queue(form.save())
+            cache.forget_card(card_version)
             return redirect('posts:post_detail', post_id)
         return render(request, template, {'form': form})
 
@@ -129,23 +180,90 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@conditional.conditional_view(conditional.follow_etag)
 def follow_index(request):
     """Страница с постами авторов, на которых
     подписан пользователь.
     """
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator(request, posts, NUMBER_OF_POSTS)
+    context = cache.feed_page(
+        request,
+        cache.follow_namespace(request.user.id),
+        lambda: _entry_feed(
+            request, TimelineEntry.objects.filter(user=request.user)
+        ),
+        counters.user_stats(request.user).feed_version,
+    )
+    return render(request, 'posts/follow.html', context)
+
+
+def tag_posts(request, name):
+    """Посты с хештегом #name."""
+    tag = get_object_or_404(Tag, name=name.lower())
     context = {
-        'posts': posts,
+        'tag': tag,
+    }
+    context.update(_entry_feed(request, tag.entries.all()))
+    return render(request, 'posts/tag_list.html', context)
+
+
+def mentions(request, username):
+    """Посты, в которых упомянут пользователь."""
+    author = get_object_or_404(User, username=username)
+    context = {
+        'author': author,
+    }
+    context.update(_entry_feed(request, author.mentions.all()))
+    return render(request, 'posts/mentions.html', context)
+
+
+def search_posts(request):
+    """Поиск по текстам постов, от самых подходящих."""
+    query = request.GET.get('q', '').strip()
+    page_obj = Paginator(
+        search.ranked_ids(query), NUMBER_OF_POSTS
+    ).get_page(request.GET.get('page'))
+    posts = Post.objects.with_related().in_bulk(page_obj.object_list)
+    page_obj.object_list = [
+        posts[post_id] for post_id in page_obj.object_list
+        if post_id in posts
+    ]
+    thumbnails.prefetch(page_obj.object_list)
+    context = {
+        'query': query,
         'page_obj': page_obj,
+        'page_params': urlencode({'q': query}) + '&',
     }
-    context.update(paginator(request, posts, NUMBER_OF_POSTS))
-    return render(request, 'posts/follow.html', context)
+    return render(request, 'posts/search.html', context)
+
+
+@staff_member_required
+def export(request):
+    """Выгрузка постов, комментариев или подписок для сотрудников:
+    ?kind=posts|comments|follows&format=jsonl|csv&since=<дата ISO>.
+    """
+    kind = request.GET.get('kind', importer.POSTS)
+    format = request.GET.get('format', importer.JSONL)
+    if kind not in importer.KINDS or format not in importer.FORMATS:
+        return HttpResponseBadRequest('Неверный kind или format')
+    since = request.GET.get('since')
+    try:
+        since = exporter.parse_since(since) if since else None
+        content = exporter.export(kind, format, since)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    response = StreamingHttpResponse(
+        content, content_type=exporter.CONTENT_TYPES[format]
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{kind}.{format}"'
+    )
+    return response
 
 
 @login_required
@@ -153,14 +271,16 @@ def profile_follow(request, username):
     """Подписка на автора."""
     author = get_object_or_404(User, username=username)
     if request.user != author:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        with transaction.atomic():
+            Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
     """Отписка от автора."""
-    Follow.objects.filter(
-        user=request.user, author__username=username
-    ).delete()
+    with transaction.atomic():
+        Follow.objects.filter(
+            user=request.user, author__username=username
+        ).delete()
     return redirect('posts:profile', username=username)
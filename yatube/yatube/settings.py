@@ -90,6 +90,19 @@ DATABASES = {
     }
 }
 
+# PRAGMA для каждого нового соединения с SQLite (core/db.py):
+# WAL не дает читателям ждать писателей, а busy_timeout заставляет
+# писателей ждать блокировку вместо ошибки "database is locked"
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'mmap_size': 128 * 1024 * 1024,
+    # Отрицательное значение задает размер кеша в КиБ
+    'cache_size': -20000,
+    'temp_store': 'memory',
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -132,6 +145,15 @@ STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки больше этого размера пишутся во временный файл на диске
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024
+# Ограничения картинок постов (posts/uploads.py): размер файла
+# и число пикселей проверяются до декодирования, а картинка
+# уменьшается до MAX_IMAGE_SIDE по большей стороне
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+MAX_IMAGE_PIXELS = 40_000_000
+MAX_IMAGE_SIDE = 2560
+
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -156,3 +178,21 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+
+# Сколько секунд страница ленты живет в кеше; записи сбрасывают
+# ее раньше через поколения (posts/cache.py)
+FEED_CACHE_TIMEOUT = 60 * 15
+
+# Сколько секунд гость получает готовую страницу из кеша;
+# 0 выключает кеш страниц. Включается в settings_production
+PAGE_CACHE_TIMEOUT = 0
+
+# Миниатюры строятся после сохранения поста (posts/thumbnails.py)
+# в THUMBNAIL_WORKERS фоновых потоках. При 0 они строятся сразу после
+# фиксации транзакции сохранения в том же потоке, а страницы построение
+# не запускают: так тесты, которым нужны миниатюры, строят их явно
+THUMBNAIL_BACKEND = 'posts.thumbnails.DeferredThumbnailBackend'
+THUMBNAIL_WORKERS = 1
+
+# Сколько последних постов хранится в ленте подписок каждого пользователя
+TIMELINE_LENGTH = 1000
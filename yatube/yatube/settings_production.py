@@ -0,0 +1,71 @@
+"""Настройки для боевого сервера.
+
+Подключаются через DJANGO_SETTINGS_MODULE=yatube.settings_production;
+секреты и адреса берутся из переменных окружения. Для кеша в базе
+(по умолчанию) перед первым запуском нужен manage.py createcachetable.
+"""
+import copy
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import (
+    DATABASES, INSTALLED_APPS, MIDDLEWARE, SECRET_KEY, TEMPLATES
+)
+
+DEBUG = os.environ.get('DJANGO_DEBUG', '') == '1'
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', SECRET_KEY)
+
+if os.environ.get('DJANGO_ALLOWED_HOSTS'):
+    ALLOWED_HOSTS = os.environ['DJANGO_ALLOWED_HOSTS'].split(',')
+
+# Панель отладки нужна только при разработке
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app != 'debug_toolbar']
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if not middleware.startswith('debug_toolbar.')
+]
+
+# Шаблоны читаются с диска и компилируются один раз на процесс
+TEMPLATES = copy.deepcopy(TEMPLATES)
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+TEMPLATES[0]['OPTIONS']['context_processors'] = [
+    processor
+    for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+    if processor != 'django.template.context_processors.debug'
+]
+
+# Соединение с базой живет между запросами
+DATABASES = copy.deepcopy(DATABASES)
+DATABASES['default']['CONN_MAX_AGE'] = int(
+    os.environ.get('DJANGO_CONN_MAX_AGE', 60)
+)
+
+# Поколения лент, кеш страниц и блокировки построения (posts/cache.py)
+# должны быть общими для всех процессов сервера, иначе запись в одном
+# процессе не сбросит кеш другого, а ETag будут различаться. Кеш
+# в памяти процесса этого не дает; по умолчанию он хранится в базе,
+# а с установленным клиентом memcached задается, например, так:
+# DJANGO_CACHE_BACKEND=django.core.cache.backends.memcached.MemcachedCache
+# DJANGO_CACHE_LOCATION=127.0.0.1:11211
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'DJANGO_CACHE_BACKEND',
+            'django.core.cache.backends.db.DatabaseCache',
+        ),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', 'yatube_cache'),
+    }
+}
+
+# Гости получают готовые страницы из общего кеша; 0 выключает его
+PAGE_CACHE_TIMEOUT = int(os.environ.get('DJANGO_PAGE_CACHE_TIMEOUT', 60 * 5))
+
+# Миниатюры строятся в фоновых потоках, а не в запросе автора
+THUMBNAIL_WORKERS = int(os.environ.get('DJANGO_THUMBNAIL_WORKERS', 2))